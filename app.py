@@ -1,46 +1,426 @@
 #!/usr/bin/env python3
 from flask import Flask, render_template, request, jsonify, send_from_directory
+from werkzeug.security import safe_join
 import sqlite3
 import os
+import bisect
+import functools
+import itertools
+import hashlib
+import json
+import math
+import mimetypes
+import re
+import queue
+import threading
+from collections import Counter
+from contextlib import contextmanager
 from pathlib import Path
 
-app = Flask(__name__, static_folder='static')
+from breeding import (COST_MODELS, MATRIX_METADATA_SOURCE, BreedingGraph, BreedingMatrix, PathCache, ids_to_mask,
+                      mask_to_ids, matrix_path_for)
+import jobs
+import metrics
+from search import PalSearchIndex
+from teams import WorkSuitabilityIndex
 
-def fix_image_url(image_url):
-    """Fix image URL by adding /static/ prefix if needed"""
+# Static files are served by static_files() below rather than Flask's built-in
+# route, which would otherwise match first and skip the caching headers
+app = Flask(__name__, static_folder=None)
+app.static_folder = 'static'
+metrics.init_app(app)
+
+# Thumbnail sizes used for pal cards and for small icons in breeding results
+CARD_IMAGE_SIZE = 128
+ICON_IMAGE_SIZE = 64
+
+_image_manifest = None
+
+def get_image_manifest():
+    """Return the thumbnail manifest written by utils/build_images.py, or {} if not built"""
+    global _image_manifest
+    if _image_manifest is None:
+        manifest_path = Path(app.static_folder) / 'thumbs' / 'manifest.json'
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                _image_manifest = json.load(f)
+        except (OSError, ValueError):
+            _image_manifest = {}
+    return _image_manifest
+
+def fix_image_url(image_url, size=None):
+    """Fix image URL by adding /static/ prefix if needed
+    
+    With size, return the smallest pre-built thumbnail at least that large
+    (or the largest one), falling back to the full image.
+    """
     if not image_url:
         return None
     if image_url.startswith('/static/'):
-        return image_url
-    if image_url.startswith('static/'):
-        return '/' + image_url
-    return '/static/' + image_url
+        pass
+    elif image_url.startswith('static/'):
+        image_url = '/' + image_url
+    else:
+        image_url = '/static/' + image_url
+    
+    if size:
+        thumbnails = get_image_manifest().get('images', {}).get(image_url[len('/static/'):])
+        if thumbnails:
+            sizes = sorted(int(thumb_size) for thumb_size in thumbnails)
+            thumb_size = next((thumb_size for thumb_size in sizes if thumb_size >= size), sizes[-1])
+            return '/static/' + thumbnails[str(thumb_size)]
+    return image_url
+
+@app.template_filter('thumbnail')
+def thumbnail_filter(image_url, size=CARD_IMAGE_SIZE):
+    """Template filter resolving an image URL to its thumbnail"""
+    return fix_image_url(image_url, size)
+
+def sprite_style(image_url, size=CARD_IMAGE_SIZE):
+    """Return inline CSS drawing an image from a sprite atlas, or None if no atlas has it
+    
+    Uses the smallest atlas at least size pixels (or the largest one). The
+    background is sized in percent, so the sprite fills its (square) element.
+    """
+    image_url = fix_image_url(image_url)
+    if not image_url:
+        return None
+    name = image_url[len('/static/'):]
+    atlases = sorted(
+        (int(atlas_size), atlas) for atlas_size, atlas in get_image_manifest().get('atlases', {}).items()
+        if name in atlas['offsets']
+    )
+    if not atlases:
+        return None
+    atlas_size, atlas = next((entry for entry in atlases if entry[0] >= size), atlases[-1])
+    columns = atlas['width'] // atlas_size
+    rows = atlas['height'] // atlas_size
+    x, y = atlas['offsets'][name]
+    
+    def position(offset, count):
+        return round(100 * (offset // atlas_size) / (count - 1), 4) if count > 1 else 0
+    
+    return (f"background-image: url('/static/{atlas['url']}'); "
+            f"background-size: {columns * 100}% {rows * 100}%; "
+            f"background-position: {position(x, columns)}% {position(y, rows)}%")
+
+@app.template_filter('sprite')
+def sprite_filter(image_url, size=CARD_IMAGE_SIZE):
+    """Template filter resolving an image URL to its sprite atlas style, or None"""
+    return sprite_style(image_url, size)
+
+# Idle read-only connections kept for reuse; extra ones are closed when returned
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+# init_db.py only replaces the database file and never writes to it in place,
+# so open connections may treat their file as immutable
+DB_IMMUTABLE = os.getenv('DB_IMMUTABLE', '1') == '1'
+
+_db_pool = queue.LifoQueue()
 
 def get_db_connection():
-    """Create a database connection"""
+    """Create a read-only database connection"""
     db_path = os.getenv('DATABASE_PATH', 'data/pals.db')
-    conn = sqlite3.connect(db_path)
+    uri = Path(db_path).resolve().as_uri() + '?mode=ro'
+    if DB_IMMUTABLE:
+        uri += '&immutable=1'
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=64)
     conn.row_factory = sqlite3.Row  # This enables column access by name
+    conn.execute('PRAGMA mmap_size = 268435456')
     return conn
 
+def _db_file_stamp():
+    """Identify the current database file, which changes when init_db.py swaps it"""
+    stat = os.stat(os.getenv('DATABASE_PATH', 'data/pals.db'))
+    return (stat.st_dev, stat.st_ino, stat.st_mtime_ns)
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled read-only database connection for the duration of a block"""
+    stamp = _db_file_stamp()
+    conn = None
+    while conn is None:
+        try:
+            conn_stamp, conn = _db_pool.get_nowait()
+        except queue.Empty:
+            conn_stamp, conn = stamp, get_db_connection()
+        if conn_stamp != stamp:
+            # The database was rebuilt since this connection was opened
+            conn.close()
+            conn = None
+    
+    try:
+        yield metrics.InstrumentedConnection(conn) if metrics.INSTRUMENTED else conn
+    finally:
+        if _db_pool.qsize() < DB_POOL_SIZE:
+            _db_pool.put((stamp, conn))
+        else:
+            conn.close()
+
+_breeding_graph = None
+_breeding_graph_lock = threading.Lock()
+_breeding_matrix = None
+_breeding_matrix_lock = threading.Lock()
+
+def load_breeding_graph(conn):
+    """Build the in-memory breeding graph from the database"""
+    pals = {}
+    for pal in conn.execute('SELECT id, name, image_url, no FROM pal').fetchall():
+        pals[pal['id']] = {
+            'id': pal['id'],
+            'name': pal['name'],
+            'image_url': fix_image_url(pal['image_url']),
+            'thumbnail_url': fix_image_url(pal['image_url'], ICON_IMAGE_SIZE),
+            'no': pal['no']
+        }
+    combinations = conn.execute(
+        'SELECT parent1_id, parent2_id, child_id FROM breeding_combination ORDER BY id'
+    ).fetchall()
+    return BreedingGraph(pals, (tuple(combo) for combo in combinations))
+
+def get_breeding_graph():
+    """Return the process-wide breeding graph, loading it on first use"""
+    global _breeding_graph
+    if _breeding_graph is None:
+        with _breeding_graph_lock:
+            if _breeding_graph is None:
+                with db_connection() as conn:
+                    _breeding_graph = load_breeding_graph(conn)
+    return _breeding_graph
+
+def stored_matrix_digest(conn):
+    """Return the matrix digest init_db.py recorded with the database, or None"""
+    row = conn.execute('SELECT checksum FROM build_metadata WHERE source = ?', (MATRIX_METADATA_SOURCE,)).fetchone()
+    return bytes.fromhex(row['checksum']) if row else None
+
+def get_breeding_matrix():
+    """Return the process-wide breeding matrix, mapping the file written by init_db.py"""
+    global _breeding_matrix
+    if _breeding_matrix is None:
+        with _breeding_matrix_lock:
+            if _breeding_matrix is None:
+                db_path = os.getenv('DATABASE_PATH', 'data/pals.db')
+                matrix = None
+                try:
+                    # The stamp catches a matrix left over from another database build
+                    with db_connection() as conn:
+                        digest = stored_matrix_digest(conn)
+                    if digest is None:
+                        raise ValueError('database has no breeding matrix stamp')
+                    matrix = BreedingMatrix.load(matrix_path_for(db_path), digest)
+                except (OSError, ValueError, sqlite3.Error) as e:
+                    print(f"Warning: breeding matrix unavailable ({e}), building it in memory")
+                if matrix is None:
+                    matrix = BreedingMatrix.from_graph(get_breeding_graph())
+                _breeding_matrix = matrix
+    return _breeding_matrix
+
+_search_index = None
+_search_index_lock = threading.Lock()
+
+def load_search_index(conn):
+    """Build the pal name search index from the database"""
+    pals = {}
+    for pal in conn.execute('SELECT id, no, name, image_url FROM pal').fetchall():
+        pals[pal['id']] = {
+            'id': pal['id'],
+            'no': pal['no'],
+            'name': pal['name'],
+            'image_url': fix_image_url(pal['image_url']),
+            'thumbnail_url': fix_image_url(pal['image_url'], CARD_IMAGE_SIZE),
+            'elements': [],
+            'work_suitabilities': {}
+        }
+    for row in conn.execute('''
+        SELECT pe.pal_id, e.name
+        FROM pal_element pe
+        JOIN element e ON pe.element_id = e.id
+    ''').fetchall():
+        if row['pal_id'] in pals:
+            pals[row['pal_id']]['elements'].append(row['name'])
+    for row in conn.execute('''
+        SELECT ws.pal_id, s.name, ws.level
+        FROM work_suitability ws
+        JOIN suitability s ON ws.suitability_id = s.id
+    ''').fetchall():
+        if row['pal_id'] in pals:
+            pals[row['pal_id']]['work_suitabilities'][row['name']] = row['level']
+    return PalSearchIndex(pals)
+
+def get_search_index():
+    """Return the process-wide pal search index, building it on first use"""
+    global _search_index
+    if _search_index is None:
+        with _search_index_lock:
+            if _search_index is None:
+                with db_connection() as conn:
+                    _search_index = load_search_index(conn)
+    return _search_index
+
+_work_index = None
+_work_index_lock = threading.Lock()
+
+def get_work_index():
+    """Return the process-wide work suitability index, building it on first use"""
+    global _work_index
+    if _work_index is None:
+        with _work_index_lock:
+            if _work_index is None:
+                with db_connection() as conn:
+                    suitabilities = [row['name'] for row in conn.execute('SELECT name FROM suitability').fetchall()]
+                    levels = conn.execute('''
+                        SELECT ws.pal_id, s.name, ws.level
+                        FROM work_suitability ws
+                        JOIN suitability s ON ws.suitability_id = s.id
+                    ''').fetchall()
+                _work_index = WorkSuitabilityIndex(suitabilities, (tuple(row) for row in levels))
+    return _work_index
+
+# Paths found by /api/breeding-plan, keyed by (owned bitmask, target id)
+PLAN_CACHE_SIZE = int(os.getenv('PLAN_CACHE_SIZE', '4096'))
+_plan_cache = PathCache(PLAN_CACHE_SIZE)
+
+# Results of /api/check-breedable-pal, keyed by endpoint and the sorted,
+# deduplicated owned ids plus target and cost. Each entry is one target's path,
+# so the cache stays small; combination lists are paged rather than cached.
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '1024'))
+_result_cache = PathCache(RESULT_CACHE_SIZE)
+
+metrics.register_cache('breeding_plan', _plan_cache)
+metrics.register_cache('breeding_results', _result_cache)
+
+def owned_key(pal_ids):
+    """Canonical form of an owned set for result cache keys; pal_ids must be integers"""
+    return tuple(sorted(set(pal_ids)))
+
+def is_integer(value):
+    """Whether a JSON value is an integer; Python counts true and false as ints too"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def owned_pal_ids(data, minimum=2):
+    """Read the owned pal ids of a breeding request, returning (ids, error message)"""
+    pal_ids = data.get('pal_ids', [])
+    if not isinstance(pal_ids, list) or not all(is_integer(pal_id) for pal_id in pal_ids):
+        return None, 'pal_ids must be a list of integers'
+    if len(pal_ids) < minimum:
+        return None, f"At least {minimum} {'pal is' if minimum == 1 else 'pals are'} required"
+    return pal_ids, None
+
+# Database file the in-memory tables above were loaded from
+_loaded_stamp = None
+
+def preload():
+    """Load every read-only in-memory table now rather than on first use.
+    
+    Each table is built once per process and only read afterwards, so request
+    threads share it freely. Called before forking workers (see wsgi.py) so
+    they share the loaded tables copy-on-write. Pooled connections are closed
+    afterwards, since SQLite connections must not be used across a fork.
+    """
+    global _loaded_stamp
+    _loaded_stamp = _db_file_stamp()
+    get_breeding_graph()
+    get_breeding_matrix()
+    get_search_index()
+    get_work_index()
+    close_db_pool()
+
+def close_db_pool():
+    """Close every idle pooled connection"""
+    while True:
+        try:
+            _, conn = _db_pool.get_nowait()
+        except queue.Empty:
+            return
+        conn.close()
+
+def reset_loaded_data():
+    """Drop the in-memory tables and caches so they are reloaded from the current database"""
+    global _breeding_graph, _breeding_matrix, _search_index, _work_index
+    with _breeding_graph_lock:
+        _breeding_graph = None
+        _breeding_matrix = None
+    with _search_index_lock:
+        _search_index = None
+    with _work_index_lock:
+        _work_index = None
+    _plan_cache.clear()
+    _result_cache.clear()
+    # Its workers hold the old tables; it is started again on first use
+    stop_job_server()
+
+@app.before_request
+def drop_stale_data():
+    """Reload in-memory tables once init_db.py has replaced the database file"""
+    global _loaded_stamp
+    stamp = _db_file_stamp()
+    if stamp != _loaded_stamp:
+        if _loaded_stamp is not None:
+            reset_loaded_data()
+        _loaded_stamp = stamp
+
+_response_cache = {}  # (endpoint, view args) -> (body, mimetype, etag)
+_response_cache_stamp = None
+_response_cache_lock = threading.Lock()
+
+def cached_response(view):
+    """Cache a view's serialized response until init_db.py rebuilds the database.
+    
+    Responses carry a strong ETag, so clients revalidating with If-None-Match
+    get a 304 without the body.
+    """
+    @functools.wraps(view)
+    def wrapper(**kwargs):
+        global _response_cache_stamp
+        stamp = _db_file_stamp()
+        key = (request.endpoint, tuple(sorted(kwargs.items())))
+        with _response_cache_lock:
+            if stamp != _response_cache_stamp:
+                _response_cache.clear()
+                _response_cache_stamp = stamp
+            entry = _response_cache.get(key)
+        
+        if entry is None:
+            response = app.make_response(view(**kwargs))
+            # Only successful responses are cached, so the cache stays bounded by the catalog size
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            entry = (body, response.mimetype, hashlib.sha1(body).hexdigest())
+            with _response_cache_lock:
+                if stamp == _response_cache_stamp:
+                    _response_cache[key] = entry
+        
+        body, mimetype, etag = entry
+        response = app.response_class(body, mimetype=mimetype)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    return wrapper
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics for this process, when METRICS_ENABLED=1"""
+    if not metrics.ENABLED:
+        return "Metrics are disabled", 404
+    return app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/')
+@cached_response
 def index():
     """Main page showing list of all pals"""
-    conn = get_db_connection()
-    
-    # Get all pals with their elements
-    query = """
-    SELECT p.id, p.no, p.name, p.image_url, 
-           GROUP_CONCAT(e.name) as elements
-    FROM pal p
-    LEFT JOIN pal_element pe ON p.id = pe.pal_id
-    LEFT JOIN element e ON pe.element_id = e.id
-    GROUP BY p.id
-    ORDER BY p.no, p.name
-    """
-    
-    pals = conn.execute(query).fetchall()
-    conn.close()
+    with db_connection() as conn:
+        # Get all pals with their elements
+        query = """
+        SELECT p.id, p.no, p.name, p.image_url, 
+               GROUP_CONCAT(e.name) as elements
+        FROM pal p
+        LEFT JOIN pal_element pe ON p.id = pe.pal_id
+        LEFT JOIN element e ON pe.element_id = e.id
+        GROUP BY p.id
+        ORDER BY p.no, p.name
+        """
+        
+        pals = conn.execute(query).fetchall()
     
     # Fix image URLs for all pals
     for pal in pals:
@@ -50,59 +430,56 @@ def index():
     return render_template('index.html', pals=pals)
 
 @app.route('/pal/<int:pal_id>')
+@cached_response
 def pal_detail(pal_id):
     """Show detailed information for a specific pal"""
-    conn = get_db_connection()
-    
-    # Get pal basic info
-    pal = conn.execute('SELECT * FROM pal WHERE id = ?', (pal_id,)).fetchone()
-    
-    if not pal:
-        conn.close()
-        return "Pal not found", 404
-    
-    # Get pal elements
-    elements = conn.execute('''
-        SELECT e.name 
-        FROM element e
-        JOIN pal_element pe ON e.id = pe.element_id
-        WHERE pe.pal_id = ?
-    ''', (pal_id,)).fetchall()
-    
-    # Get work suitabilities
-    work_suitabilities = conn.execute('''
-        SELECT s.name, ws.level
-        FROM work_suitability ws
-        JOIN suitability s ON ws.suitability_id = s.id
-        WHERE ws.pal_id = ?
-        ORDER BY ws.level DESC, s.name
-    ''', (pal_id,)).fetchall()
-    
-    # Get breeding combinations where this pal is a parent
-    breeding_as_parent = conn.execute('''
-        SELECT p1.name as parent1_name, p2.name as parent2_name, c.name as child_name,
-               c.id as child_id, c.image_url as child_image_url
-        FROM breeding_combination bc
-        JOIN pal p1 ON bc.parent1_id = p1.id
-        JOIN pal p2 ON bc.parent2_id = p2.id
-        JOIN pal c ON bc.child_id = c.id
-        WHERE bc.parent1_id = ? OR bc.parent2_id = ?
-        ORDER BY c.name
-    ''', (pal_id, pal_id)).fetchall()
-    
-    # Get breeding combinations where this pal is a child
-    breeding_as_child = conn.execute('''
-        SELECT p1.name as parent1_name, p2.name as parent2_name,
-               p1.id as parent1_id, p2.id as parent2_id,
-               p1.image_url as parent1_image_url, p2.image_url as parent2_image_url
-        FROM breeding_combination bc
-        JOIN pal p1 ON bc.parent1_id = p1.id
-        JOIN pal p2 ON bc.parent2_id = p2.id
-        WHERE bc.child_id = ?
-        ORDER BY p1.name, p2.name
-    ''', (pal_id,)).fetchall()
-    
-    conn.close()
+    with db_connection() as conn:
+        # Get pal basic info
+        pal = conn.execute('SELECT * FROM pal WHERE id = ?', (pal_id,)).fetchone()
+        
+        if not pal:
+            return "Pal not found", 404
+        
+        # Get pal elements
+        elements = conn.execute('''
+            SELECT e.name 
+            FROM element e
+            JOIN pal_element pe ON e.id = pe.element_id
+            WHERE pe.pal_id = ?
+        ''', (pal_id,)).fetchall()
+        
+        # Get work suitabilities
+        work_suitabilities = conn.execute('''
+            SELECT s.name, ws.level
+            FROM work_suitability ws
+            JOIN suitability s ON ws.suitability_id = s.id
+            WHERE ws.pal_id = ?
+            ORDER BY ws.level DESC, s.name
+        ''', (pal_id,)).fetchall()
+        
+        # Get breeding combinations where this pal is a parent
+        breeding_as_parent = conn.execute('''
+            SELECT p1.name as parent1_name, p2.name as parent2_name, c.name as child_name,
+                   c.id as child_id, c.image_url as child_image_url
+            FROM breeding_combination bc
+            JOIN pal p1 ON bc.parent1_id = p1.id
+            JOIN pal p2 ON bc.parent2_id = p2.id
+            JOIN pal c ON bc.child_id = c.id
+            WHERE bc.parent1_id = ? OR bc.parent2_id = ?
+            ORDER BY c.name
+        ''', (pal_id, pal_id)).fetchall()
+        
+        # Get breeding combinations where this pal is a child
+        breeding_as_child = conn.execute('''
+            SELECT p1.name as parent1_name, p2.name as parent2_name,
+                   p1.id as parent1_id, p2.id as parent2_id,
+                   p1.image_url as parent1_image_url, p2.image_url as parent2_image_url
+            FROM breeding_combination bc
+            JOIN pal p1 ON bc.parent1_id = p1.id
+            JOIN pal p2 ON bc.parent2_id = p2.id
+            WHERE bc.child_id = ?
+            ORDER BY p1.name, p2.name
+        ''', (pal_id,)).fetchall()
     
     # Fix image URLs
     pal = dict(pal)
@@ -126,22 +503,21 @@ def pal_detail(pal_id):
                          breeding_as_child=breeding_as_child)
 
 @app.route('/api/pals')
+@cached_response
 def api_pals():
     """API endpoint to get all pals as JSON"""
-    conn = get_db_connection()
-    
-    query = """
-    SELECT p.id, p.no, p.name, p.image_url, 
-           GROUP_CONCAT(e.name) as elements
-    FROM pal p
-    LEFT JOIN pal_element pe ON p.id = pe.pal_id
-    LEFT JOIN element e ON pe.element_id = e.id
-    GROUP BY p.id
-    ORDER BY p.no, p.name
-    """
-    
-    pals = conn.execute(query).fetchall()
-    conn.close()
+    with db_connection() as conn:
+        query = """
+        SELECT p.id, p.no, p.name, p.image_url, 
+               GROUP_CONCAT(e.name) as elements
+        FROM pal p
+        LEFT JOIN pal_element pe ON p.id = pe.pal_id
+        LEFT JOIN element e ON pe.element_id = e.id
+        GROUP BY p.id
+        ORDER BY p.no, p.name
+        """
+        
+        pals = conn.execute(query).fetchall()
     
     # Convert to list of dictionaries
     pals_list = []
@@ -151,250 +527,835 @@ def api_pals():
             'no': pal['no'],
             'name': pal['name'],
             'image_url': fix_image_url(pal['image_url']),
+            'thumbnail_url': fix_image_url(pal['image_url'], CARD_IMAGE_SIZE),
             'elements': pal['elements'].split(',') if pal['elements'] else []
         })
     
     return jsonify(pals_list)
 
-@app.route('/api/pal/<int:pal_id>')
-def api_pal_detail(pal_id):
-    """API endpoint to get detailed pal information as JSON"""
-    conn = get_db_connection()
+def fetch_pal_details(conn, pal_ids):
+    """Return {pal_id: detail dict} for the given ids using one query per table"""
+    pal_ids = list(dict.fromkeys(pal_ids))
+    if not pal_ids:
+        return {}
+    placeholders = ','.join('?' * len(pal_ids))
     
-    # Get pal basic info
-    pal = conn.execute('SELECT * FROM pal WHERE id = ?', (pal_id,)).fetchone()
-    
-    if not pal:
-        conn.close()
-        return jsonify({'error': 'Pal not found'}), 404
+    pals = conn.execute(
+        'SELECT * FROM pal WHERE id IN ({})'.format(placeholders), pal_ids
+    ).fetchall()
+    details = {}
+    for pal in pals:
+        details[pal['id']] = {
+            'id': pal['id'],
+            'no': pal['no'],
+            'name': pal['name'],
+            'image_url': fix_image_url(pal['image_url']),
+            'elements': [],
+            'work_suitabilities': []
+        }
     
-    # Get pal elements
     elements = conn.execute('''
-        SELECT e.name 
+        SELECT pe.pal_id, e.name 
         FROM element e
         JOIN pal_element pe ON e.id = pe.element_id
-        WHERE pe.pal_id = ?
-    ''', (pal_id,)).fetchall()
+        WHERE pe.pal_id IN ({})
+        ORDER BY pe.pal_id, pe.element_id
+    '''.format(placeholders), pal_ids).fetchall()
+    for element in elements:
+        details[element['pal_id']]['elements'].append(element['name'])
     
-    # Get work suitabilities
     work_suitabilities = conn.execute('''
-        SELECT s.name, ws.level
+        SELECT ws.pal_id, s.name, ws.level
         FROM work_suitability ws
         JOIN suitability s ON ws.suitability_id = s.id
-        WHERE ws.pal_id = ?
-        ORDER BY ws.level DESC, s.name
-    ''', (pal_id,)).fetchall()
+        WHERE ws.pal_id IN ({})
+        ORDER BY ws.pal_id, ws.level DESC, s.name
+    '''.format(placeholders), pal_ids).fetchall()
+    for ws in work_suitabilities:
+        details[ws['pal_id']]['work_suitabilities'].append({'name': ws['name'], 'level': ws['level']})
     
-    conn.close()
+    return details
+
+@app.route('/api/pal/<int:pal_id>')
+@cached_response
+def api_pal_detail(pal_id):
+    """API endpoint to get detailed pal information as JSON"""
+    with db_connection() as conn:
+        details = fetch_pal_details(conn, [pal_id])
+    
+    if pal_id not in details:
+        return jsonify({'error': 'Pal not found'}), 404
+    
+    return jsonify(details[pal_id])
+
+# Largest number of pal or target ids accepted by the batch endpoints
+MAX_BATCH_SIZE = 100
+
+def batch_ids(data, key):
+    """Read a list of integer ids for a batch endpoint, returning (ids, error message)"""
+    ids = data.get(key)
+    if not isinstance(ids, list) or not ids:
+        return None, f'{key} must be a non-empty list'
+    if len(ids) > MAX_BATCH_SIZE:
+        return None, f'At most {MAX_BATCH_SIZE} {key} are accepted per request'
+    if not all(is_integer(pal_id) for pal_id in ids):
+        return None, f'{key} must only contain integers'
+    return ids, None
+
+@app.route('/api/pals/batch', methods=['POST'])
+def api_pals_batch():
+    """API endpoint to get detailed information for several pals at once"""
+    data = request.get_json()
+    pal_ids, error = batch_ids(data, 'pal_ids')
+    if error:
+        return jsonify({'error': error}), 400
+    
+    with db_connection() as conn:
+        details = fetch_pal_details(conn, pal_ids)
     
     return jsonify({
-        'id': pal['id'],
-        'no': pal['no'],
-        'name': pal['name'],
-        'image_url': fix_image_url(pal['image_url']),
-        'elements': [e['name'] for e in elements],
-        'work_suitabilities': [{'name': ws['name'], 'level': ws['level']} for ws in work_suitabilities]
+        'pals': [details[pal_id] for pal_id in dict.fromkeys(pal_ids) if pal_id in details],
+        'not_found': [pal_id for pal_id in dict.fromkeys(pal_ids) if pal_id not in details]
     })
 
+# Largest number of results /api/search returns at once
+MAX_SEARCH_RESULTS = 500
+
+@app.route('/api/search')
+def api_search():
+    """Typeahead search over pal names, filterable by element and work suitability"""
+    query = request.args.get('q', '')
+    elements = request.args.getlist('element')
+    
+    # work=Kindling or work=Kindling:3 for a minimum level
+    works = []
+    for work in request.args.getlist('work'):
+        name, _, level = work.partition(':')
+        try:
+            works.append((name, int(level) if level else 1))
+        except ValueError:
+            return jsonify({'error': f'Invalid work suitability level: {work}'}), 400
+    
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if limit < 1:
+        return jsonify({'error': 'limit must be positive'}), 400
+    # Larger limits are clamped rather than rejected, since the pages ask for every pal
+    limit = min(limit, MAX_SEARCH_RESULTS)
+    
+    index = get_search_index()
+    pal_ids, total = index.search(query, elements, works, limit)
+    results = []
+    for pal_id in pal_ids:
+        pal = index.pals[pal_id]
+        results.append({
+            'id': pal['id'],
+            'no': pal['no'],
+            'name': pal['name'],
+            'image_url': pal['image_url'],
+            'thumbnail_url': pal['thumbnail_url'],
+            'elements': pal['elements']
+        })
+    
+    return jsonify({'results': results, 'total': total})
+
+# Candidates listed per requirement by /api/team-composition unless asked otherwise
+TEAM_CANDIDATES = 5
+
+@app.route('/api/team-composition', methods=['POST'])
+def api_team_composition():
+    """API endpoint to find the fewest pals covering a set of work suitability levels"""
+    data = request.get_json()
+    requirements = data.get('requirements', [])
+    owned_ids = data.get('pal_ids')
+    candidates_limit = data.get('candidates', TEAM_CANDIDATES)
+    
+    if not isinstance(requirements, list) or not all(isinstance(requirement, dict) for requirement in requirements):
+        return jsonify({'error': 'requirements must be a list of {work, level} objects'}), 400
+    if not requirements:
+        return jsonify({'error': 'At least one requirement is required'}), 400
+    if owned_ids is not None and (not isinstance(owned_ids, list) or
+                                  not all(is_integer(pal_id) for pal_id in owned_ids)):
+        return jsonify({'error': 'pal_ids must be a list of integers'}), 400
+    if not is_integer(candidates_limit) or candidates_limit < 0:
+        return jsonify({'error': 'candidates must be a non-negative integer'}), 400
+    
+    work_index = get_work_index()
+    # Requirements on the same suitability collapse to the highest level asked for
+    required_levels = {}
+    for requirement in requirements:
+        work = work_index.resolve(str(requirement.get('work', '')))
+        level = requirement.get('level', 1)
+        if work is None:
+            return jsonify({'error': f"Unknown work suitability: {requirement.get('work')}"}), 400
+        if not is_integer(level) or level < 1:
+            return jsonify({'error': f'Invalid level for {work}: {level}'}), 400
+        required_levels[work] = max(level, required_levels.get(work, 0))
+    requirements = list(required_levels.items())
+    
+    graph = get_breeding_graph()
+    # Optionally only pick pals that are owned or breedable from the owned ones
+    generations = None
+    allowed = None
+    if owned_ids is not None:
+        generations = graph.closure([pal_id for pal_id in owned_ids if pal_id in graph.pals])
+        allowed = ids_to_mask(generations)
+    
+    def preference(pal_id):
+        # Prefer pals available sooner, then pals with higher levels in the required work
+        levels = work_index.pal_levels.get(pal_id, {})
+        total_level = sum(levels.get(work, 0) for work, _ in requirements)
+        generation = generations[pal_id] if generations is not None else 0
+        return (generation, -total_level, pal_id)
+    
+    team, unmet = work_index.compose_team(requirements, allowed, preference)
+    
+    requirement_results = []
+    for work, min_level in requirements:
+        ranked = work_index.ranking(work, min_level, allowed)
+        requirement_results.append({
+            'work': work,
+            'level': min_level,
+            'total': len(ranked),
+            'candidates': [
+                {'pal': graph.pals[pal_id], 'level': level}
+                for level, pal_id in ranked[:candidates_limit] if pal_id in graph.pals
+            ]
+        })
+    
+    team_results = None
+    if team is not None:
+        team_results = []
+        for pal_id in team:
+            levels = work_index.pal_levels.get(pal_id, {})
+            team_results.append({
+                'pal': graph.pals[pal_id],
+                'generation': generations.get(pal_id) if generations is not None else None,
+                'covers': [
+                    {'work': work, 'level': levels[work]}
+                    for work, min_level in requirements if levels.get(work, 0) >= min_level
+                ]
+            })
+    
+    return jsonify({
+        'feasible': team is not None,
+        'team': team_results,
+        'team_size': len(team) if team is not None else None,
+        'unmet': [{'work': requirements[index][0], 'level': requirements[index][1]} for index in unmet],
+        'requirements': requirement_results
+    })
+
+# Fields accepted by /api/breeding-combinations: full pal objects or just ids
+COMBINATION_FIELDS = ('full', 'ids')
+
+def combination_dict(graph, combo, fields):
+    """Serialize a (parent1_id, parent2_id, child_id) combination"""
+    parent1_id, parent2_id, child_id = combo
+    if fields == 'ids':
+        return {'parent1_id': parent1_id, 'parent2_id': parent2_id, 'child_id': child_id}
+    return {
+        'parent1': graph.pals[parent1_id],
+        'parent2': graph.pals[parent2_id],
+        'child': graph.pals[child_id]
+    }
+
+def encode_combination_cursor(combo):
+    """Pack the last combination of a page into an opaque cursor"""
+    parent1_id, parent2_id, child_id = combo
+    return f"{child_id}.{parent1_id}.{parent2_id}"
+
+def decode_combination_cursor(cursor, matrix):
+    """Unpack a combination cursor into (parent1_id, parent2_id, child_id), or raise ValueError"""
+    child_id, parent1_id, parent2_id = (int(part) for part in str(cursor).split('.'))
+    if matrix.child_of(parent1_id, parent2_id) != child_id:
+        raise ValueError(f"Not a breeding combination: {cursor}")
+    return parent1_id, parent2_id, child_id
+
 @app.route('/api/breeding-combinations', methods=['POST'])
 def api_breeding_combinations():
-    """API endpoint to get breeding combinations for selected pals"""
+    """API endpoint to get breeding combinations for selected pals
+    
+    Optional body fields: fields ('full' or 'ids'), limit and cursor for
+    pagination, and format='ndjson' (or Accept: application/x-ndjson) to
+    stream one combination per line. Combinations are ordered by child name;
+    the cursor holds the last combination of the previous page, and the next
+    page starts right after it.
+    """
     data = request.get_json()
-    pal_ids = data.get('pal_ids', [])
+    pal_ids, error = owned_pal_ids(data)
+    if error:
+        return jsonify({'error': error}), 400
     
-    if len(pal_ids) < 2:
-        return jsonify({'error': 'At least 2 pals are required'}), 400
+    fields = data.get('fields', 'full')
+    if fields not in COMBINATION_FIELDS:
+        return jsonify({'error': f"fields must be one of: {', '.join(COMBINATION_FIELDS)}"}), 400
     
-    conn = get_db_connection()
+    try:
+        limit = data.get('limit')
+        if isinstance(limit, bool):
+            raise TypeError('limit must not be a boolean')
+        limit = int(limit) if limit is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if limit is not None and limit < 1:
+        return jsonify({'error': 'limit must be positive'}), 400
     
-    # Get all breeding combinations between the selected pals
-    placeholders = ','.join(['?' for _ in pal_ids])
-    query = '''
-        SELECT DISTINCT
-            p1.id as parent1_id, p1.name as parent1_name, p1.image_url as parent1_image_url,
-            p2.id as parent2_id, p2.name as parent2_name, p2.image_url as parent2_image_url,
-            c.id as child_id, c.name as child_name, c.image_url as child_image_url, c.no as child_no
-        FROM breeding_combination bc
-        JOIN pal p1 ON bc.parent1_id = p1.id
-        JOIN pal p2 ON bc.parent2_id = p2.id
-        JOIN pal c ON bc.child_id = c.id
-        WHERE (p1.id IN ({}) AND p2.id IN ({}))
-        ORDER BY c.name
-    '''.format(placeholders, placeholders)
+    graph = get_breeding_graph()
+    matrix = get_breeding_matrix()
     
-    # Execute query with pal_ids twice (for both parent1 and parent2)
-    params = pal_ids + pal_ids
-    combinations = conn.execute(query, params).fetchall()
+    after = None
+    if data.get('cursor'):
+        try:
+            after = decode_combination_cursor(data['cursor'], matrix)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
     
-    conn.close()
+    # The box's own pairs come from the matrix in O(k^2); the cursor is found by bisection
+    combinations = sorted(matrix.children_of_set(pal_ids), key=graph.combination_order)
+    total = len(combinations)
+    start = 0
+    if after is not None:
+        start = bisect.bisect_right(combinations, graph.combination_order(after), key=graph.combination_order)
+    end = total if limit is None else min(start + limit, total)
+    next_cursor = encode_combination_cursor(combinations[end - 1]) if start < end < total else None
     
-    # Convert to list of dictionaries
-    combinations_list = []
-    for combo in combinations:
-        combinations_list.append({
-            'parent1': {
-                'id': combo['parent1_id'],
-                'name': combo['parent1_name'],
-                'image_url': fix_image_url(combo['parent1_image_url'])
-            },
-            'parent2': {
-                'id': combo['parent2_id'],
-                'name': combo['parent2_name'],
-                'image_url': fix_image_url(combo['parent2_image_url'])
-            },
-            'child': {
-                'id': combo['child_id'],
-                'name': combo['child_name'],
-                'image_url': fix_image_url(combo['child_image_url']),
-                'no': combo['child_no']
-            }
+    streamed = data.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best == 'application/x-ndjson'
+    if streamed:
+        def generate():
+            for combo in itertools.islice(combinations, start, end):
+                yield json.dumps(combination_dict(graph, combo, fields)) + '\n'
+        
+        response = app.response_class(generate(), mimetype='application/x-ndjson')
+        response.headers['X-Total-Combinations'] = str(total)
+        if next_cursor is not None:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+    
+    return jsonify({
+        'combinations': [combination_dict(graph, combo, fields) for combo in combinations[start:end]],
+        'total_combinations': total,
+        'next_cursor': next_cursor
+    })
+
+# Most generations a single /api/breeding-session call may advance
+MAX_SESSION_GENERATIONS = 10
+
+def encode_session_token(step, available, frontier):
+    """Pack a breeding session's state into an opaque token"""
+    return f"{step}.{ids_to_mask(available):x}.{ids_to_mask(frontier):x}"
+
+def decode_session_token(token, pal_ids):
+    """Unpack a session token into (step, available, frontier), or raise ValueError
+    
+    Ids outside pal_ids are dropped, so a tampered token can't grow the work.
+    """
+    step, available, frontier = str(token).split('.')
+    valid = ids_to_mask(pal_ids)
+    available = set(mask_to_ids(int(available, 16) & valid))
+    frontier = mask_to_ids(int(frontier, 16) & valid)
+    return int(step), available, frontier
+
+@app.route('/api/breeding-session', methods=['POST'])
+def api_breeding_session():
+    """API endpoint to breed the next generation(s) of a step-by-step breeding session
+    
+    Start with pal_ids, then pass back the returned token to continue. Each
+    step only contains combinations producing pals that weren't available yet.
+    The session state lives in the token, so any worker can serve any step.
+    """
+    data = request.get_json()
+    token = data.get('token')
+    
+    graph = get_breeding_graph()
+    
+    if token:
+        try:
+            step, available, frontier = decode_session_token(token, graph.pals)
+        except ValueError:
+            return jsonify({'error': 'Invalid session token'}), 400
+    else:
+        pal_ids, error = owned_pal_ids(data)
+        if error:
+            return jsonify({'error': error}), 400
+        step = 0
+        available = {pal_id for pal_id in pal_ids if pal_id in graph.pals}
+        frontier = sorted(available)
+    
+    try:
+        generations = int(data.get('generations', 1))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'generations must be an integer'}), 400
+    generations = max(1, min(generations, MAX_SESSION_GENERATIONS))
+    
+    steps = []
+    for _ in range(generations):
+        if not frontier:
+            break
+        combinations = graph.breed_step(available, set(frontier))
+        if not combinations:
+            # Nothing new to breed: the session is done without an empty step
+            frontier = []
+            break
+        step += 1
+        combinations.sort(key=lambda combo: graph.pals[combo[2]]['name'])
+        
+        # New children become available for the next step
+        frontier = sorted({child_id for _, _, child_id in combinations})
+        available.update(frontier)
+        
+        steps.append({
+            'step': step,
+            'combinations': [{
+                'parent1': graph.pals[parent1_id],
+                'parent2': graph.pals[parent2_id],
+                'child': graph.pals[child_id]
+            } for parent1_id, parent2_id, child_id in combinations],
+            'available_count': len(available) - len(frontier)
         })
     
     return jsonify({
-        'combinations': combinations_list,
-        'total_combinations': len(combinations_list)
+        'steps': steps,
+        'token': encode_session_token(step, available, frontier),
+        'done': not frontier
     })
 
 @app.route('/api/check-breedable-pal', methods=['POST'])
 def api_check_breedable_pal():
     """API endpoint to check if a specific pal can be bred from selected pals"""
     data = request.get_json()
-    pal_ids = data.get('pal_ids', [])
+    pal_ids, error = owned_pal_ids(data)
     target_pal_id = data.get('target_pal_id')
     
-    if len(pal_ids) < 2:
-        return jsonify({'error': 'At least 2 pals are required'}), 400
+    if error:
+        return jsonify({'error': error}), 400
     
     if not target_pal_id:
         return jsonify({'error': 'Target pal ID is required'}), 400
     
-    conn = get_db_connection()
+    if not is_integer(target_pal_id):
+        return jsonify({'error': 'target_pal_id must be an integer'}), 400
     
-    # Get all pals for reference
-    all_pals = {}
-    pals_query = "SELECT id, name, image_url, no FROM pal"
-    for pal in conn.execute(pals_query).fetchall():
-        all_pals[pal['id']] = {
-            'id': pal['id'],
-            'name': pal['name'],
-            'image_url': fix_image_url(pal['image_url']),
-            'no': pal['no']
-        }
+    graph = get_breeding_graph()
     
     # Check if target pal exists
-    if target_pal_id not in all_pals:
-        conn.close()
+    if target_pal_id not in graph.pals:
         return jsonify({'error': 'Target pal not found'}), 404
     
-    target_pal = all_pals[target_pal_id]
+    # Optional search mode: 'generations' returns the path with the fewest generations,
+    # 'breeds' a path with few breeds (approximate, see BreedingGraph.find_path)
+    cost = data.get('cost')
+    if cost is not None and cost not in COST_MODELS:
+        return jsonify({'error': f"cost must be one of: {', '.join(COST_MODELS)}"}), 400
     
-    # Simulate breeding steps to find if target pal can be bred
-    available_pals = set(pal_ids)
-    all_combinations = []  # Store all combinations for all steps
-    max_steps = 10  # Prevent infinite loops
-    step = 0
-    found = False
+    # Identical owned sets (starter boxes) are common, so results are shared between requests
+    owned_ids = owned_key(pal_ids)
+    result = _result_cache.get_or_compute(
+        ('check-breedable-pal', owned_ids, target_pal_id, cost),
+        lambda: check_breedable_pals(graph, owned_ids, [target_pal_id], cost)[target_pal_id])
+    return jsonify(result)
+
+@app.route('/api/check-breedable-pals', methods=['POST'])
+def api_check_breedable_pals():
+    """API endpoint to check several target pals against the same selected pals at once"""
+    params, error = check_breedable_pals_params(request.get_json())
+    if error:
+        return jsonify({'error': error}), 400
     
-    while step < max_steps:
-        step += 1
-        new_combinations = []
-        
-        # Get all possible breeding combinations with current available pals
-        placeholders = ','.join(['?' for _ in available_pals])
-        query = '''
-            SELECT DISTINCT
-                p1.id as parent1_id, p2.id as parent2_id,
-                c.id as child_id
-            FROM breeding_combination bc
-            JOIN pal p1 ON bc.parent1_id = p1.id
-            JOIN pal p2 ON bc.parent2_id = p2.id
-            JOIN pal c ON bc.child_id = c.id
-            WHERE (p1.id IN ({}) AND p2.id IN ({}))
-        '''.format(placeholders, placeholders)
-        
-        params = list(available_pals) + list(available_pals)
-        combinations = conn.execute(query, params).fetchall()
-        
-        for combo in combinations:
-            child_id = combo['child_id']
-            parent1_id = combo['parent1_id']
-            parent2_id = combo['parent2_id']
-            
-            # Check if this is a new combination (child not already available)
-            if child_id not in available_pals:
-                new_combinations.append({
-                    'step': step,
-                    'parent1': all_pals[parent1_id],
-                    'parent2': all_pals[parent2_id],
-                    'child': all_pals[child_id]
-                })
-                
-                # Add child to available pals
-                available_pals.add(child_id)
-                
-                # If this is the target, mark as found
-                if child_id == target_pal_id:
-                    found = True
-        
-        all_combinations.extend(new_combinations)
-        
-        # If found, break
-        if found:
-            break
-        # If no new combinations found, we can't breed the target
-        if not new_combinations:
-            break
+    return jsonify(check_breedable_pals_response(**params))
+
+def check_breedable_pals_params(data):
+    """Validate a /api/check-breedable-pals body, returning (params, error)"""
+    pal_ids, error = owned_pal_ids(data)
+    if error:
+        return None, error
+    
+    target_pal_ids, error = batch_ids(data, 'target_pal_ids')
+    if error:
+        return None, error
     
-    conn.close()
+    cost = data.get('cost')
+    if cost is not None and cost not in COST_MODELS:
+        return None, f"cost must be one of: {', '.join(COST_MODELS)}"
     
-    if found:
-        # Recursively build the full path to the target
-        full_path = build_full_breeding_path(target_pal_id, all_combinations, set(pal_ids))
-        return jsonify({
+    return {'pal_ids': pal_ids, 'target_pal_ids': target_pal_ids, 'cost': cost}, None
+
+def check_breedable_pals_response(pal_ids, target_pal_ids, cost=None):
+    """Build the /api/check-breedable-pals response; also run as a background job"""
+    graph = get_breeding_graph()
+    target_pal_ids = list(dict.fromkeys(target_pal_ids))
+    known_ids = [pal_id for pal_id in target_pal_ids if pal_id in graph.pals]
+    results = check_breedable_pals(graph, pal_ids, known_ids, cost)
+    
+    return {
+        'results': [
+            results.get(pal_id, {'target_pal_id': pal_id, 'error': 'Target pal not found'})
+            for pal_id in target_pal_ids
+        ]
+    }
+
+@app.route('/api/breeding-plan', methods=['POST'])
+def api_breeding_plan():
+    """API endpoint to plan breeding several target pals at once, sharing intermediate breeds"""
+    params, error = breeding_plan_params(request.get_json())
+    if error:
+        return jsonify({'error': error}), 400
+    
+    return jsonify(breeding_plan_response(**params))
+
+def breeding_plan_params(data):
+    """Validate a /api/breeding-plan body, returning (params, error)"""
+    pal_ids, error = owned_pal_ids(data)
+    if error:
+        return None, error
+    
+    target_pal_ids, error = batch_ids(data, 'target_pal_ids')
+    if error:
+        return None, error
+    
+    return {'pal_ids': pal_ids, 'target_pal_ids': target_pal_ids}, None
+
+def breeding_plan_response(pal_ids, target_pal_ids):
+    """Build the /api/breeding-plan response; also run as a background job"""
+    graph = get_breeding_graph()
+    owned_ids = [pal_id for pal_id in dict.fromkeys(pal_ids) if pal_id in graph.pals]
+    target_pal_ids = list(dict.fromkeys(target_pal_ids))
+    known_ids = [pal_id for pal_id in target_pal_ids if pal_id in graph.pals]
+    
+    operations, unbreedable = graph.plan(owned_ids, known_ids, _plan_cache)
+    generations = {child_id: step for step, _, _, child_id in operations}
+    
+    # Breeds each target needs on its own: the operations it depends on in the plan
+    operation_of = {child_id: (parent1_id, parent2_id) for _, parent1_id, parent2_id, child_id in operations}
+    targets = []
+    for target_pal_id in known_ids:
+        if target_pal_id in unbreedable:
+            targets.append({'target_pal': graph.pals[target_pal_id], 'breedable': False})
+            continue
+        needed = set()
+        stack = [target_pal_id]
+        while stack:
+            pal_id = stack.pop()
+            if pal_id in operation_of and pal_id not in needed:
+                needed.add(pal_id)
+                stack.extend(operation_of[pal_id])
+        targets.append({
+            'target_pal': graph.pals[target_pal_id],
             'breedable': True,
-            'target_pal': target_pal,
-            'breeding_path': full_path,
-            'steps_required': len(full_path)
+            'generation': generations.get(target_pal_id, 0),
+            'breeds_required': len(needed)
         })
+    
+    return {
+        'plan': [{
+            'step': step,
+            'parent1': graph.pals[parent1_id],
+            'parent2': graph.pals[parent2_id],
+            'child': graph.pals[child_id]
+        } for step, parent1_id, parent2_id, child_id in operations],
+        'targets': targets,
+        'not_found': [pal_id for pal_id in target_pal_ids if pal_id not in graph.pals],
+        'total_breeds': len(operations),
+        'generations_required': max(generations.values(), default=0)
+    }
+
+def check_breedable_pals(graph, pal_ids, target_pal_ids, cost=None):
+    """Check several known targets with one graph pass, returning {target id: response dict}"""
+    paths = {}
+    if cost:
+        for target_pal_id, path in graph.find_paths(pal_ids, target_pal_ids, cost).items():
+            # Owned targets have an empty path; like the simulation, they are not bred
+            if path:
+                paths[target_pal_id] = [{
+                    'step': step,
+                    'parent1': graph.pals[parent1_id],
+                    'parent2': graph.pals[parent2_id],
+                    'child': graph.pals[child_id]
+                } for step, parent1_id, parent2_id, child_id in path]
     else:
-        return jsonify({
-            'breedable': False,
-            'target_pal': target_pal,
-            'message': 'Target pal cannot be bred from the selected pals'
+        # Simulate breeding steps against the in-memory graph to find which targets can be bred.
+        # A single target stops the simulation at its step; earlier steps are the same either way.
+        max_steps = 10  # Prevent infinite loops
+        target_pal_id = target_pal_ids[0] if len(target_pal_ids) == 1 else None
+        steps, _ = graph.simulate(pal_ids, target_pal_id, max_steps)
+        # Store all combinations for all steps
+        all_combinations = [{
+            'step': step,
+            'parent1': graph.pals[parent1_id],
+            'parent2': graph.pals[parent2_id],
+            'child': graph.pals[child_id]
+        } for step, parent1_id, parent2_id, child_id in steps]
+        bred = {child_id for _, _, _, child_id in steps}
+        for target_pal_id in target_pal_ids:
+            if target_pal_id in bred:
+                # Recursively build the full path to the target
+                paths[target_pal_id] = build_full_breeding_path(target_pal_id, all_combinations, set(pal_ids))
+    
+    results = {}
+    for target_pal_id in target_pal_ids:
+        target_pal = graph.pals[target_pal_id]
+        full_path = paths.get(target_pal_id)
+        if full_path is not None:
+            results[target_pal_id] = {
+                'breedable': True,
+                'target_pal': target_pal,
+                'breeding_path': full_path,
+                'steps_required': len(full_path),
+                'generations_required': max((combo['step'] for combo in full_path), default=0)
+            }
+        else:
+            results[target_pal_id] = {
+                'breedable': False,
+                'target_pal': target_pal,
+                'message': 'Target pal cannot be bred from the selected pals'
+            }
+    return results
+
+# Background job types: (body validator, response builder run in a job worker)
+JOB_TYPES = {
+    'breeding-plan': (breeding_plan_params, breeding_plan_response),
+    'check-breedable-pals': (check_breedable_pals_params, check_breedable_pals_response),
+}
+# Longest a job poll may wait for the job to finish, in seconds. A waiting poll
+# holds one of the worker's request threads, so keep this short.
+MAX_JOB_WAIT = float(os.getenv('MAX_JOB_WAIT', '10'))
+
+_job_server = None  # JobManager of the job server, shared with processes forked after it started
+_job_server_pid = None
+_job_client = None
+_job_client_pid = None
+_job_lock = threading.Lock()
+
+def start_job_server():
+    """Fork the background job server from this process, with its loaded tables.
+    
+    wsgi.py calls this in the gunicorn master, so every worker uses one
+    server, and the development server calls it before serving. Otherwise
+    it is started on first use.
+    """
+    global _job_server, _job_server_pid
+    with _job_lock:
+        if _job_server is not None:
+            return
+        # The server and its workers are forked with the tables in memory and must not share connections
+        get_breeding_graph()
+        close_db_pool()
+        handlers = {job_type: build for job_type, (_, build) in JOB_TYPES.items()}
+        _job_server = jobs.start_server(handlers)
+        _job_server_pid = os.getpid()
+
+def stop_job_server():
+    """Shut down the job server if this process started it; its jobs are dropped"""
+    global _job_server, _job_client
+    with _job_lock:
+        if _job_server is not None and _job_server_pid == os.getpid():
+            _job_server.shutdown()
+            _job_server = None
+            _job_client = None
+
+def get_job_service():
+    """Return this process's proxy to the job server, starting the server if needed"""
+    global _job_client, _job_client_pid
+    if _job_server is None:
+        start_job_server()
+    with _job_lock:
+        if _job_client is None or _job_client_pid != os.getpid():
+            _job_client = jobs.connect(_job_server.address)
+            _job_client_pid = os.getpid()
+        return _job_client
+
+@app.route('/api/jobs', methods=['POST'])
+def api_submit_job():
+    """API endpoint to run a breeding plan or multi-target check as a background job
+    
+    The body is that endpoint's body plus type ('breeding-plan' or
+    'check-breedable-pals') and an optional time_budget in seconds.
+    Returns 202 with the job to poll at /api/jobs/<job_id>.
+    """
+    data = request.get_json()
+    job_type = data.get('type')
+    
+    if job_type not in JOB_TYPES:
+        return jsonify({'error': f"type must be one of: {', '.join(JOB_TYPES)}"}), 400
+    
+    time_budget = data.get('time_budget', jobs.JOB_TIME_BUDGET)
+    if isinstance(time_budget, bool) or not isinstance(time_budget, (int, float)) or \
+            not 0 < time_budget <= jobs.MAX_JOB_TIME_BUDGET:
+        return jsonify({'error': f'time_budget must be between 0 and {jobs.MAX_JOB_TIME_BUDGET:g} seconds'}), 400
+    
+    params, error = JOB_TYPES[job_type][0](data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    job = get_job_service().submit(job_type, params, float(time_budget))
+    if job is None:
+        return jsonify({'error': 'Too many queued jobs, try again later'}), 503
+    return jsonify(job), 202
+
+@app.route('/api/jobs/<job_id>')
+def api_job(job_id):
+    """API endpoint to poll a background job; ?wait=n long-polls up to n seconds for it to finish"""
+    try:
+        wait = float(request.args.get('wait', 0))
+    except ValueError:
+        return jsonify({'error': 'wait must be a number of seconds'}), 400
+    if not math.isfinite(wait):
+        return jsonify({'error': 'wait must be a number of seconds'}), 400
+    
+    job = get_job_service().get(job_id, min(max(wait, 0), MAX_JOB_WAIT))
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def api_cancel_job(job_id):
+    """API endpoint to cancel a queued or running background job"""
+    job = get_job_service().cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/breeding-closure', methods=['POST'])
+def api_breeding_closure():
+    """API endpoint to get every pal eventually breedable from selected pals"""
+    pal_ids, error = owned_pal_ids(request.get_json())
+    if error:
+        return jsonify({'error': error}), 400
+    
+    graph = get_breeding_graph()
+    owned_ids = [pal_id for pal_id in pal_ids if pal_id in graph.pals]
+    generations = graph.closure(owned_ids)
+    
+    reachable = []
+    for pal_id, generation in generations.items():
+        if generation == 0:
+            continue
+        parent1_id, parent2_id = graph.first_parents(pal_id, generations)
+        reachable.append({
+            'pal': graph.pals[pal_id],
+            'generation': generation,
+            'parent1': graph.pals[parent1_id],
+            'parent2': graph.pals[parent2_id]
         })
+    reachable.sort(key=lambda item: (item['generation'], item['pal']['name']))
+    
+    return jsonify({
+        'reachable': reachable,
+        'total_reachable': len(reachable),
+        'generations': max(generations.values(), default=0)
+    })
+
+@app.route('/api/best-acquisition', methods=['POST'])
+def api_best_acquisition():
+    """API endpoint to rank unowned pals by what acquiring each one would unlock"""
+    data = request.get_json()
+    pal_ids, error = owned_pal_ids(data, minimum=1)
+    target_pal_id = data.get('target_pal_id')
+    limit = data.get('limit', 20)
+    
+    if error:
+        return jsonify({'error': error}), 400
+    if not is_integer(limit) or limit < 1:
+        return jsonify({'error': 'limit must be a positive integer'}), 400
+    
+    graph = get_breeding_graph()
+    if target_pal_id is not None and (not is_integer(target_pal_id) or target_pal_id not in graph.pals):
+        return jsonify({'error': 'target_pal_id must be the id of a known pal'}), 400
+    
+    owned = {pal_id for pal_id in pal_ids if pal_id in graph.pals}
+    reach, target_generations = graph.acquisition_gains(owned, target_pal_id)
+    
+    # Bit 0 is the closure of the owned pals alone; bit n adds pal id n to it
+    reachable_counts = Counter()
+    for mask in reach.values():
+        for bit in mask_to_ids(mask):
+            reachable_counts[bit] += 1
+    base_count = reachable_counts[0]
+    base_generation = target_generations.get(0)
+    
+    candidates = []
+    for pal_id in graph.pals:
+        if pal_id in owned or pal_id == target_pal_id:
+            continue  # Owned, or the target itself
+        # A pal that was already breedable unlocks nothing new, but may still shorten the target path
+        already_breedable = reach[pal_id] & 1
+        candidate = {
+            'pal': graph.pals[pal_id],
+            'new_breedable': reachable_counts[pal_id] - base_count - (0 if already_breedable else 1)
+        }
+        if target_pal_id is not None:
+            generation = target_generations.get(pal_id)
+            candidate['target_breedable'] = generation is not None
+            candidate['target_generation'] = generation
+            candidate['generations_saved'] = (
+                base_generation - generation
+                if generation is not None and base_generation is not None else None)
+        candidates.append(candidate)
+    
+    if target_pal_id is None:
+        candidates.sort(key=lambda item: (-item['new_breedable'], item['pal']['name']))
+    else:
+        candidates.sort(key=lambda item: (
+            not item['target_breedable'],
+            item['target_generation'] or 0,
+            -item['new_breedable'],
+            item['pal']['name']
+        ))
+    
+    response = {
+        'candidates': candidates[:limit],
+        'total_candidates': len(candidates),
+        'breedable_count': base_count - len(owned)
+    }
+    if target_pal_id is not None:
+        response['target_pal'] = graph.pals[target_pal_id]
+        response['target_breedable'] = base_generation is not None
+        response['target_generation'] = base_generation
+    return jsonify(response)
 
 def build_full_breeding_path(target_id, all_combinations, initial_pals):
-    """Recursively build the full breeding path to the target pal as an ordered list of steps."""
+    """Build the full breeding path to the target pal as an ordered list of steps.
+    
+    Each intermediate pal appears once, before the first step that uses it.
+    """
+    combos_by_child = {}
+    for combo in all_combinations:
+        combos_by_child.setdefault(combo['child']['id'], combo)
+    
     path = []
-    combo = next((c for c in all_combinations if c['child']['id'] == target_id), None)
-    if not combo:
-        return []
-    # Recursively add parent1 path if not in initial
-    if combo['parent1']['id'] not in initial_pals:
-        path += build_full_breeding_path(combo['parent1']['id'], all_combinations, initial_pals)
-    # Recursively add parent2 path if not in initial
-    if combo['parent2']['id'] not in initial_pals:
-        path += build_full_breeding_path(combo['parent2']['id'], all_combinations, initial_pals)
-    # Add this step
-    path.append(combo)
+    visited = set(initial_pals)
+    
+    def add_steps(pal_id):
+        combo = combos_by_child.get(pal_id)
+        if pal_id in visited or not combo:
+            return
+        visited.add(pal_id)
+        # Add the parents' paths first
+        add_steps(combo['parent1']['id'])
+        add_steps(combo['parent2']['id'])
+        path.append(combo)
+    
+    add_steps(target_id)
     return path
 
 @app.route('/breeder')
+@cached_response
 def breeder():
     """Breeding calculator page"""
-    conn = get_db_connection()
-    
-    # Get all pals for the selection dropdown
-    pals = conn.execute('''
-        SELECT p.id, p.name, p.image_url, p.no,
-               GROUP_CONCAT(e.name) as elements
-        FROM pal p
-        LEFT JOIN pal_element pe ON p.id = pe.pal_id
-        LEFT JOIN element e ON pe.element_id = e.id
-        WHERE p.no != -1  -- Exclude special pals
-        GROUP BY p.id
-        ORDER BY p.no, p.name
-    ''').fetchall()
+    with db_connection() as conn:
+        # Get all pals for the selection dropdown
+        pals = conn.execute('''
+            SELECT p.id, p.name, p.image_url, p.no,
+                   GROUP_CONCAT(e.name) as elements
+            FROM pal p
+            LEFT JOIN pal_element pe ON p.id = pe.pal_id
+            LEFT JOIN element e ON pe.element_id = e.id
+            WHERE p.no != -1  -- Exclude special pals
+            GROUP BY p.id
+            ORDER BY p.no, p.name
+        ''').fetchall()
     
     # Convert no to string and fix image URLs
     formatted_pals = []
@@ -404,18 +1365,40 @@ def breeder():
         pal_dict['image_url'] = fix_image_url(pal_dict['image_url'])
         formatted_pals.append(pal_dict)
     
-    conn.close()
     return render_template('breeder.html', pals=formatted_pals)
 
-@app.route('/static/<path:filename>')
+# Precompressed variants written by utils/compress_static.py, in order of preference
+PRECOMPRESSED_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+COMPRESSIBLE_SUFFIXES = ('.css', '.js', '.html', '.json', '.svg', '.txt')
+# Content-hashed names from utils/build_images.py, e.g. Anubis.5792cad7d2fe.webp
+FINGERPRINTED_NAME = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+
+@app.route('/static/<path:filename>', endpoint='static')
 def static_files(filename):
-    """Serve static files (images) with optimization headers"""
-    response = send_from_directory(app.static_folder, filename)
+    """Serve static files with caching headers and precompressed variants"""
+    response = None
+    compressible = filename.lower().endswith(COMPRESSIBLE_SUFFIXES)
+    
+    if compressible:
+        mimetype = mimetypes.guess_type(filename)[0]
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            variant = safe_join(app.static_folder, filename + suffix)
+            if encoding in request.accept_encodings and variant and os.path.isfile(variant):
+                response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                break
     
-    # Add caching headers for images
-    if filename.lower().endswith(('.webp', '.png', '.jpg', '.jpeg')):
-        response.headers['Cache-Control'] = 'public, max-age=31536000'  # 1 year
-        response.headers['Expires'] = 'Thu, 31 Dec 2025 23:59:59 GMT'
+    if response is None:
+        response = send_from_directory(app.static_folder, filename)
+    if compressible:
+        response.vary.add('Accept-Encoding')
+    
+    # Fingerprinted files never change; others are revalidated with
+    # ETag/Last-Modified once the hour is up
+    if FINGERPRINTED_NAME.search(filename):
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'public, max-age=3600'
     
     return response
 
@@ -427,6 +1410,15 @@ if __name__ == '__main__':
         print("Please run the container first to create the database.")
         exit(1)
     
+    # Load the breeding graph, matrix and search indexes once before serving requests
+    preload()
+    
+    # Fork the job server from the main thread rather than a request thread. With
+    # the reloader, only the child process that werkzeug restarts serves requests.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_job_server()
+    
+    # Development server only; see wsgi.py for production serving
     print(f"Starting Flask app...")
     print(f"Database: {db_path}")
     print(f"Open your browser to: http://localhost:5000")
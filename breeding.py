@@ -0,0 +1,665 @@
+#!/usr/bin/env python3
+"""In-memory breeding graph and breeding matrix used by the breeding endpoints in app.py"""
+import hashlib
+import heapq
+import mmap
+import struct
+import sys
+import threading
+from array import array
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+
+# Cost models accepted by BreedingGraph.find_path
+COST_MODELS = ('generations', 'breeds')
+
+# Breeding matrix file: magic, pal id bound N, SHA-256 of the combinations it
+# was built from, then N*N little-endian uint16 child ids where cell
+# [parent1_id * N + parent2_id] is 0 when there is no child
+MATRIX_MAGIC = b'PAL2'
+MATRIX_HEADER = struct.Struct('<4sI32s')
+COMBINATION_RECORD = struct.Struct('<III')
+
+# build_metadata source under which init_db.py stamps the matrix digest
+MATRIX_METADATA_SOURCE = 'breeding_matrix'
+
+# PathCache.get default telling a cached None (unbreedable) apart from a miss
+_NOT_CACHED = object()
+
+
+def matrix_path_for(db_path):
+    """Return the breeding matrix path that goes with a database file"""
+    db_path = Path(db_path)
+    return db_path.with_name(db_path.stem + '_breeding.bin')
+
+
+def unique_combinations(combinations):
+    """Keep the first (parent1_id, parent2_id, child_id) of each parent pair, as BreedingGraph does"""
+    unique = {}
+    for combo in combinations:
+        unique.setdefault(pair_key(combo[0], combo[1]), tuple(combo))
+    return list(unique.values())
+
+
+def combinations_digest(combinations):
+    """SHA-256 of unique combinations, independent of their order and of parent order"""
+    digest = hashlib.sha256()
+    for parent1_id, parent2_id, child_id in sorted(pair_key(p1, p2) + (child,) for p1, p2, child in combinations):
+        digest.update(COMBINATION_RECORD.pack(parent1_id, parent2_id, child_id))
+    return digest.digest()
+
+
+def write_breeding_matrix(path, combinations, size=None):
+    """Write combinations of (parent1_id, parent2_id, child_id) as a dense matrix file.
+
+    size is the pal id bound and defaults to the highest id in combinations + 1.
+    The header records combinations_digest() so readers can tell a matrix
+    built from other data apart.
+    """
+    combinations = unique_combinations(combinations)
+    if size is None:
+        size = max((max(combo) for combo in combinations), default=0) + 1
+    cells = array('H', bytes(2 * size * size))
+    for parent1_id, parent2_id, child_id in combinations:
+        cells[parent1_id * size + parent2_id] = child_id
+        cells[parent2_id * size + parent1_id] = child_id
+    if sys.byteorder != 'little':
+        cells.byteswap()
+
+    # Write next to the target and rename so readers never see a partial file
+    tmp_path = Path(str(path) + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(MATRIX_HEADER.pack(MATRIX_MAGIC, size, combinations_digest(combinations)))
+        cells.tofile(f)
+    tmp_path.replace(path)
+    return size
+
+
+class PathCache:
+    """Thread-safe LRU of breeding results with hit, miss and eviction counters.
+
+    get_or_compute() also coalesces concurrent misses for the same key: the
+    first caller computes the value while the others wait for its result.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._in_flight = {}  # key -> _Flight computing it
+        self._epoch = 0  # Bumped by clear() so results computed before it are dropped
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the value for key, calling compute() once however many threads ask"""
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            flight = self._in_flight.get(key)
+            waiting = flight is not None
+            if waiting:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                flight = self._in_flight[key] = _Flight()
+            epoch = self._epoch
+
+        if waiting:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None and epoch == self._epoch:
+                    self._store(key, flight.value)
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+            flight.done.set()
+        return flight.value
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._in_flight.clear()
+            self._epoch += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class _Flight:
+    """A computation in progress that other callers of get_or_compute() wait on"""
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def pair_key(parent1_id, parent2_id):
+    """Order-independent key for a parent pair"""
+    if parent1_id <= parent2_id:
+        return (parent1_id, parent2_id)
+    return (parent2_id, parent1_id)
+
+
+def ids_to_mask(pal_ids):
+    """Pack pal ids into a bitmask where bit n stands for pal id n"""
+    mask = 0
+    for pal_id in pal_ids:
+        mask |= 1 << pal_id
+    return mask
+
+
+def mask_to_ids(mask):
+    """Unpack a bitmask into the sorted list of pal ids it contains"""
+    pal_ids = []
+    while mask:
+        low_bit = mask & -mask
+        pal_ids.append(low_bit.bit_length() - 1)
+        mask ^= low_bit
+    return pal_ids
+
+
+class BreedingGraph:
+    """Breeding combinations from the breeding_combination table, indexed by parent pair and by child."""
+
+    def __init__(self, pals, combinations):
+        # pals: {pal_id: pal_dict}, combinations: iterable of (parent1_id, parent2_id, child_id)
+        self.pals = pals
+        self.combinations = {}  # pair_key -> (parent1_id, parent2_id, child_id)
+        self.parents_of = defaultdict(list)  # child_id -> [(parent1_id, parent2_id), ...]
+        self.children_of = defaultdict(list)  # parent_id -> [(partner_id, child_id), ...]
+        # parent_id -> {child_id: bitmask of partner ids}; bit n stands for pal id n
+        self.partner_masks = defaultdict(dict)
+
+        for parent1_id, parent2_id, child_id in combinations:
+            key = pair_key(parent1_id, parent2_id)
+            if key in self.combinations:
+                continue
+            self.combinations[key] = (parent1_id, parent2_id, child_id)
+            self.parents_of[child_id].append((parent1_id, parent2_id))
+            self.children_of[parent1_id].append((parent2_id, child_id))
+            if parent2_id != parent1_id:
+                self.children_of[parent2_id].append((parent1_id, child_id))
+
+            children = self.partner_masks[parent1_id]
+            children[child_id] = children.get(child_id, 0) | (1 << parent2_id)
+            children = self.partner_masks[parent2_id]
+            children[child_id] = children.get(child_id, 0) | (1 << parent1_id)
+
+        # pal_id -> position in (name, id) order, for sorting combinations by child name
+        self.name_rank = {
+            pal_id: rank for rank, pal_id in enumerate(sorted(pals, key=lambda pal_id: (pals[pal_id]['name'], pal_id)))
+        }
+
+    def combination_order(self, combo):
+        """Sort key of a combination: child name, child id, then parent ids"""
+        parent1_id, parent2_id, child_id = combo
+        return self.name_rank[child_id], parent1_id, parent2_id
+
+    def child_of(self, parent1_id, parent2_id):
+        """Return the child id bred from two parents, or None"""
+        combo = self.combinations.get(pair_key(parent1_id, parent2_id))
+        return combo[2] if combo else None
+
+    def breed_step(self, available, frontier):
+        """Breed one generation from a box where only frontier pals are new.
+
+        Pairs of older pals were bred in earlier generations, so only pairs with
+        at least one frontier pal are tried. Returns every (parent1_id,
+        parent2_id, child_id) whose child is not already in available.
+        """
+        combinations = []
+        for pal_id in frontier:
+            for partner_id, child_id in self.children_of.get(pal_id, ()):
+                if partner_id not in available or child_id in available:
+                    continue
+                if partner_id in frontier and partner_id < pal_id:
+                    continue  # Already seen from the partner's side
+                combinations.append(self.combinations[pair_key(pal_id, partner_id)])
+        return combinations
+
+    def simulate(self, pal_ids, target_pal_id=None, max_steps=10):
+        """Simulate breeding generations starting from pal_ids.
+
+        Each step breeds every pair of currently available pals and adds the
+        children that are new. Returns (combinations, found) where combinations
+        is a list of (step, parent1_id, parent2_id, child_id) tuples in the order
+        the children were first bred. Stops early once target_pal_id is bred.
+        """
+        available = set(pal_ids)
+        ordered = sorted(available)
+        frontier = ordered
+        combinations = []
+        found = False
+        step = 0
+
+        while step < max_steps and frontier:
+            step += 1
+            new_children = []
+
+            # Pairs made only of older pals were already bred in a previous
+            # step, so only pairs touching the last step's children matter.
+            frontier_set = set(frontier)
+            for pal_id in frontier:
+                for other_id in ordered:
+                    if other_id in frontier_set and other_id < pal_id:
+                        continue
+                    combo = self.combinations.get(pair_key(pal_id, other_id))
+                    if combo is None or combo[2] in available:
+                        continue
+                    parent1_id, parent2_id, child_id = combo
+                    combinations.append((step, parent1_id, parent2_id, child_id))
+                    available.add(child_id)
+                    new_children.append(child_id)
+                    if child_id == target_pal_id:
+                        found = True
+
+            if found:
+                break
+
+            frontier = sorted(new_children)
+            ordered = sorted(available)
+
+        return combinations, found
+
+    def closure(self, pal_ids):
+        """Return {pal_id: generation} for every pal breedable from pal_ids.
+
+        Owned pals are generation 0. A pal first appears in generation n when
+        it can be bred from pals of generations below n. The owned set is kept
+        as a bitmask, so a generation is one pass over the partner masks of the
+        pals added by the previous generation.
+        """
+        generations = {pal_id: 0 for pal_id in pal_ids}
+        owned = ids_to_mask(generations)
+
+        frontier = list(generations)
+        generation = 0
+        while frontier:
+            generation += 1
+            bred = 0
+            for pal_id in frontier:
+                for child_id, partners in self.partner_masks.get(pal_id, {}).items():
+                    if partners & owned:
+                        bred |= 1 << child_id
+            bred &= ~owned
+            owned |= bred
+
+            frontier = mask_to_ids(bred)
+            for child_id in frontier:
+                generations[child_id] = generation
+
+        return generations
+
+    def acquisition_gains(self, pal_ids, target_pal_id=None):
+        """Evaluate acquiring each pal not in pal_ids, for all candidates at once.
+
+        Every pal carries a bitmask of the candidates whose closure contains
+        it: bit n for acquiring pal id n and bit 0 for acquiring nothing (pal
+        ids start at 1). A child becomes reachable for the candidates that
+        reach both of its parents, so one generation-by-generation sweep over
+        the pairs touching last generation's changes updates every candidate
+        together instead of running one closure per candidate.
+
+        Returns (reach, target_generations) where reach is {pal_id: bitmask}
+        and target_generations is {candidate bit: generation the target is
+        first bred in}, with bit 0 for the owned pals alone.
+        """
+        owned = set(pal_ids)
+        candidates = [pal_id for pal_id in self.pals if pal_id not in owned]
+        everyone = ids_to_mask(candidates) | 1
+        reach = {pal_id: everyone for pal_id in owned}
+        for pal_id in candidates:
+            reach[pal_id] = 1 << pal_id
+
+        target_generations = {}
+        if target_pal_id in reach:
+            for bit in mask_to_ids(reach[target_pal_id]):
+                target_generations[bit] = 0
+
+        frontier = list(reach)
+        generation = 0
+        while frontier:
+            generation += 1
+            # Read only last generation's masks so generations are counted exactly
+            bred = {}
+            for pal_id in frontier:
+                mask = reach[pal_id]
+                for partner_id, child_id in self.children_of.get(pal_id, ()):
+                    both = mask & reach.get(partner_id, 0)
+                    if both:
+                        bred[child_id] = bred.get(child_id, 0) | both
+
+            frontier = []
+            for child_id, mask in bred.items():
+                new = mask & ~reach.get(child_id, 0)
+                if not new:
+                    continue
+                reach[child_id] = reach.get(child_id, 0) | new
+                frontier.append(child_id)
+                if child_id == target_pal_id:
+                    for bit in mask_to_ids(new):
+                        target_generations[bit] = generation
+
+        return reach, target_generations
+
+    def first_parents(self, child_id, generations):
+        """Return a parent pair that breeds child_id from earlier generations"""
+        generation = generations[child_id]
+        for parent1_id, parent2_id in self.parents_of.get(child_id, ()):
+            if generations.get(parent1_id, generation) < generation and \
+                    generations.get(parent2_id, generation) < generation:
+                return parent1_id, parent2_id
+        return None
+
+    def find_path(self, pal_ids, target_pal_id, cost='breeds'):
+        """Find the cheapest way to breed target_pal_id from pal_ids.
+
+        cost is 'generations' (fewest breeding generations, ties broken by
+        breed count) or 'breeds' (few breeding operations, ties broken by
+        generations). Breed counts treat every intermediate pal as bred once
+        and then reused, so parents sharing intermediates are cheaper.
+
+        Generations are exact. Breed counts are approximate: a pal keeps only
+        the bred set of its cheapest path, and the union of two parents' sets
+        can be smaller for costlier sets, so the search does not always find
+        the fewest breeds (that problem is a Steiner tree search, NP-hard).
+        'breeds' therefore returns the shortest of its own path, the
+        'generations' path and the simulated path, so it is never longer
+        than either.
+
+        Returns a list of (generation, parent1_id, parent2_id, child_id)
+        tuples with parents before children, an empty list when the target is
+        owned, or None when the target cannot be bred.
+        """
+        return self.find_paths(pal_ids, [target_pal_id], cost)[target_pal_id]
+
+    def find_paths(self, pal_ids, target_pal_ids, cost='breeds'):
+        """Find the cheapest path to each of several targets in one search.
+
+        Returns {target_pal_id: path or None} with paths as in find_path.
+        """
+        if cost not in COST_MODELS:
+            raise ValueError(f"Unknown cost model: {cost}")
+        paths = self._search_paths(pal_ids, target_pal_ids, cost)
+        if cost == 'generations':
+            return paths
+
+        # The breeds search is a heuristic; fall back to the other two when they are shorter
+        candidates = (paths,
+                      self._search_paths(pal_ids, target_pal_ids, 'generations'),
+                      self.simulated_paths(pal_ids, target_pal_ids))
+        return {
+            target_pal_id: min(
+                (found[target_pal_id] for found in candidates if found[target_pal_id] is not None),
+                key=lambda path: (len(path), max((step[0] for step in path), default=0)),
+                default=None)
+            for target_pal_id in target_pal_ids
+        }
+
+    def simulated_paths(self, pal_ids, target_pal_ids, max_steps=10):
+        """Path to each target taken from simulate(): every pal bred from its
+        first combination in the simulation, parents before children.
+
+        Returns {target_pal_id: path or None} with paths as in find_path,
+        except that owned targets are None because the simulation never breeds them.
+        """
+        steps, _ = self.simulate(pal_ids, None, max_steps)
+        first = {}
+        for _, parent1_id, parent2_id, child_id in steps:
+            first.setdefault(child_id, (parent1_id, parent2_id, child_id))
+
+        paths = {}
+        for target_pal_id in target_pal_ids:
+            if target_pal_id not in first:
+                paths[target_pal_id] = None
+                continue
+            generations = {pal_id: 0 for pal_id in pal_ids}
+            path = []
+            stack = [(target_pal_id, False)]
+            while stack:
+                pal_id, parents_added = stack.pop()
+                if pal_id in generations and not parents_added:
+                    continue
+                parent1_id, parent2_id, _ = first[pal_id]
+                if parents_added:
+                    if pal_id not in generations:
+                        generations[pal_id] = max(generations[parent1_id], generations[parent2_id]) + 1
+                        path.append((generations[pal_id],) + first[pal_id])
+                    continue
+                stack.append((pal_id, True))
+                stack.append((parent2_id, False))
+                stack.append((parent1_id, False))
+            paths[target_pal_id] = path
+        return paths
+
+    def _search_paths(self, pal_ids, target_pal_ids, cost):
+        """One best-first search for every target under a cost model.
+
+        A pal's cost is final once popped, so one search that runs until every
+        target is popped gives each target the same path as its own search.
+        """
+        # Knuth's generalisation of Dijkstra: a pal's cost is final once popped,
+        # and only pairs of final pals are combined into candidate children.
+        # pal_id -> (generations, breeds, parents, bitmask of pals bred on the way)
+        best = {pal_id: (0, 0, None, 0) for pal_id in pal_ids}
+        heap = [((0, 0), pal_id) for pal_id in best]
+        heapq.heapify(heap)
+        done = set()
+        remaining = set(target_pal_ids)
+
+        while heap and remaining:
+            key, pal_id = heapq.heappop(heap)
+            if pal_id in done:
+                continue
+            done.add(pal_id)
+            remaining.discard(pal_id)
+            if not remaining:
+                break
+
+            generations, _, _, bred = best[pal_id]
+            for partner_id, child_id in self.children_of.get(pal_id, ()):
+                if partner_id not in done or child_id in done:
+                    continue
+                partner_generations, _, _, partner_bred = best[partner_id]
+                child_generations = max(generations, partner_generations) + 1
+                child_bred = bred | partner_bred | (1 << child_id)
+                child_breeds = child_bred.bit_count()
+                if cost == 'generations':
+                    child_key = (child_generations, child_breeds)
+                else:
+                    child_key = (child_breeds, child_generations)
+
+                current = best.get(child_id)
+                if current is not None:
+                    if cost == 'generations':
+                        current_key = (current[0], current[1])
+                    else:
+                        current_key = (current[1], current[0])
+                    if current_key <= child_key:
+                        continue
+                best[child_id] = (child_generations, child_breeds, (pal_id, partner_id), child_bred)
+                heapq.heappush(heap, (child_key, child_id))
+
+        return {
+            target_pal_id: self._chosen_path(best, target_pal_id) if target_pal_id in done else None
+            for target_pal_id in target_pal_ids
+        }
+
+    def plan(self, pal_ids, target_pal_ids, cache=None):
+        """Plan breeding every target from pal_ids, sharing intermediate pals.
+
+        Targets are added greedily: each round searches the cheapest path (by
+        breeds) to every remaining target from the owned pals plus everything
+        already planned, takes the cheapest target and adds its breeds. Later
+        targets therefore reuse earlier targets' intermediates for free.
+        cache is an optional PathCache of paths per (owned bitmask, target).
+
+        Returns (operations, unbreedable) where operations is a list of
+        (generation, parent1_id, parent2_id, child_id) tuples with parents
+        before children and each pal bred once, and unbreedable lists the
+        targets that can't be bred.
+        """
+        owned = set(pal_ids)
+        operations = []
+        remaining = [pal_id for pal_id in dict.fromkeys(target_pal_ids) if pal_id not in owned]
+
+        while remaining:
+            owned_mask = ids_to_mask(owned)
+            paths = {}
+            if cache is not None:
+                for target_pal_id in remaining:
+                    path = cache.get((owned_mask, target_pal_id), _NOT_CACHED)
+                    if path is not _NOT_CACHED:
+                        paths[target_pal_id] = path
+            missing = [target_pal_id for target_pal_id in remaining if target_pal_id not in paths]
+            if missing:
+                for target_pal_id, path in self.find_paths(owned, missing, 'breeds').items():
+                    path = tuple(path) if path is not None else None
+                    paths[target_pal_id] = path
+                    if cache is not None:
+                        cache.put((owned_mask, target_pal_id), path)
+
+            breedable = [target_pal_id for target_pal_id in remaining if paths[target_pal_id] is not None]
+            if not breedable:
+                # Planned pals are all breedable from pal_ids, so nothing new becomes reachable
+                break
+            chosen = min(breedable, key=lambda target_pal_id: (len(paths[target_pal_id]), target_pal_id))
+            for _, parent1_id, parent2_id, child_id in paths[chosen]:
+                operations.append((parent1_id, parent2_id, child_id))
+                owned.add(child_id)
+            remaining = [target_pal_id for target_pal_id in remaining if target_pal_id not in owned]
+
+        # Generations come from the merged plan, where planned pals are not owned
+        generations = {pal_id: 0 for pal_id in pal_ids}
+        planned = []
+        for parent1_id, parent2_id, child_id in operations:
+            generations[child_id] = max(generations[parent1_id], generations[parent2_id]) + 1
+            planned.append((generations[child_id], parent1_id, parent2_id, child_id))
+        return planned, remaining
+
+    def _chosen_path(self, best, target_pal_id):
+        """Walk the chosen parents back from the target, emitting each bred pal
+        once so shared intermediates are only bred a single time."""
+        path = []
+        emitted = set()
+        stack = [(target_pal_id, False)]
+        while stack:
+            pal_id, parents_emitted = stack.pop()
+            parents = best[pal_id][2]
+            if parents is None or pal_id in emitted:
+                continue
+            if parents_emitted:
+                emitted.add(pal_id)
+                path.append((best[pal_id][0],) + self.combinations[pair_key(*parents)])
+                continue
+            stack.append((pal_id, True))
+            for parent_id in reversed(parents):
+                stack.append((parent_id, False))
+        return path
+
+
+class BreedingMatrix:
+    """Dense pair -> child lookup backed by the matrix file from init_db.py.
+
+    The file is memory-mapped read-only, so every worker process shares the
+    same page-cached pages and nothing is parsed at startup.
+    """
+
+    def __init__(self, cells, size):
+        self.cells = cells
+        self.size = size
+
+    @classmethod
+    def load(cls, path, digest=None):
+        """Map a matrix file; with digest, raise ValueError unless it was built from those combinations"""
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(buffer) < MATRIX_HEADER.size:
+            raise ValueError(f"Not a breeding matrix file: {path}")
+        magic, size, file_digest = MATRIX_HEADER.unpack_from(buffer)
+        if magic != MATRIX_MAGIC or len(buffer) != MATRIX_HEADER.size + 2 * size * size:
+            raise ValueError(f"Not a breeding matrix file: {path}")
+        if digest is not None and file_digest != digest:
+            raise ValueError(f"Breeding matrix is stale: {path}")
+        cells = memoryview(buffer)[MATRIX_HEADER.size:]
+        if sys.byteorder != 'little':
+            cells = array('H', cells)
+            cells.byteswap()
+            return cls(cells, size)
+        return cls(cells.cast('H'), size)
+
+    @classmethod
+    def from_graph(cls, graph):
+        """Build an in-memory matrix when no matrix file is available"""
+        size = max(graph.pals, default=0) + 1
+        cells = array('H', bytes(2 * size * size))
+        for parent1_id, parent2_id, child_id in graph.combinations.values():
+            cells[parent1_id * size + parent2_id] = child_id
+            cells[parent2_id * size + parent1_id] = child_id
+        return cls(cells, size)
+
+    def child_of(self, parent1_id, parent2_id):
+        """Return the child id bred from two parents, or None"""
+        size = self.size
+        if not (0 <= parent1_id < size and 0 <= parent2_id < size):
+            return None
+        return self.cells[parent1_id * size + parent2_id] or None
+
+    def children_of_set(self, pal_ids):
+        """Yield (parent1_id, parent2_id, child_id) for every pair within pal_ids"""
+        size = self.size
+        cells = self.cells
+        ordered = sorted({pal_id for pal_id in pal_ids if 0 <= pal_id < size})
+        for index, parent1_id in enumerate(ordered):
+            row = parent1_id * size
+            for parent2_id in ordered[index:]:
+                child_id = cells[row + parent2_id]
+                if child_id:
+                    yield parent1_id, parent2_id, child_id
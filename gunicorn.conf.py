@@ -0,0 +1,67 @@
+"""gunicorn settings for serving wsgi:app in production.
+
+Every setting can be overridden from the environment:
+
+    GUNICORN_BIND         address to listen on (default 0.0.0.0:5000)
+    GUNICORN_WORKERS      worker processes (default 2 * CPUs + 1)
+    GUNICORN_THREADS      request threads per worker (default 4)
+    GUNICORN_TIMEOUT      seconds before a silent worker is restarted (default 30)
+    DB_WATCH_INTERVAL     seconds between database file checks, 0 to disable (default 5)
+
+When init_db.py replaces the database file, the master reloads the in-memory
+tables and gracefully replaces the workers, the same as sending it SIGHUP.
+"""
+import gc
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('GUNICORN_WORKERS', str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = 30
+keepalive = 5
+
+# Import the app and load its read-only tables once in the master, before forking
+preload_app = True
+wsgi_app = 'wsgi:app'
+
+accesslog = '-'
+errorlog = '-'
+
+DB_WATCH_INTERVAL = float(os.getenv('DB_WATCH_INTERVAL', '5'))
+
+
+def _watch_database(server):
+    """Send the master SIGHUP when the database file is replaced"""
+    import app
+    stamp = app._db_file_stamp()
+    while True:
+        time.sleep(DB_WATCH_INTERVAL)
+        try:
+            current = app._db_file_stamp()
+        except OSError:
+            continue
+        if current != stamp:
+            stamp = current
+            server.log.info("Database file changed, reloading workers")
+            os.kill(os.getpid(), signal.SIGHUP)
+
+
+def when_ready(server):
+    if DB_WATCH_INTERVAL > 0:
+        threading.Thread(target=_watch_database, args=(server,), daemon=True).start()
+
+
+def on_reload(server):
+    # Workers forked after a reload share the master's tables, so refresh them there first
+    import app
+    gc.unfreeze()
+    app.reset_loaded_data()
+    app.preload()
+    app.start_job_server()
+    gc.freeze()
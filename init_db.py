@@ -3,220 +3,518 @@ import sqlite3
 import os
 import sys
 import json
+import hashlib
+import itertools
+import shutil
 from pathlib import Path
 
-def create_database():
-    """Create the database and all tables"""
+from breeding import (MATRIX_METADATA_SOURCE, BreedingMatrix, combinations_digest, matrix_path_for,
+                      unique_combinations, write_breeding_matrix)
+from json_stream import CHUNK_SIZE, iter_arrays
+
+DATA_DIR = Path("data")
+STATIC_DIR = Path("static")
+
+# Bump when the schema or load logic changes so existing databases get a full rebuild
+SCHEMA_VERSION = 3
+
+# Source JSON file -> table it fills
+SOURCE_TABLES = {
+    'elements.json': 'element',
+    'suitabilities.json': 'suitability',
+    'pals.json': 'pal',
+    'pal_elements.json': 'pal_element',
+    'work_suitabilities.json': 'work_suitability',
+    'breeding_combinations.json': 'breeding_combination',
+}
+
+# Raw game8 dump read by --raw, and the arrays streamed out of it
+RAW_DATA_FILE = 'raw_data.json'
+RAW_PALS_PATH = ('palArraySchema', 'pals')
+RAW_COMBINATIONS_PATH = ('combinationArraySchema', 'combinations')
+IMAGE_SUFFIXES = ('.webp', '.png', '.jpg', '.jpeg')
+
+# Tables holding ids of another table, which must be reloaded along with it
+DEPENDENT_TABLES = {
+    'element': ['pal_element'],
+    'suitability': ['work_suitability'],
+    'pal': ['pal_element', 'work_suitability', 'breeding_combination'],
+}
+
+# Load order, parents before the tables referencing them
+TABLE_ORDER = ['element', 'suitability', 'pal', 'pal_element', 'work_suitability', 'breeding_combination']
+
+def create_database(force=False, raw=False):
+    """Create or update the database, reloading only tables whose source changed
+    
+    With raw, pals and breeding combinations are streamed from raw_data.json
+    instead of pals.json and breeding_combinations.json.
+    """
     
     # Get database path from environment or use default
     db_path = os.getenv('DATABASE_PATH', 'pals.db')
     
-    print(f"Creating database at: {db_path}")
+    sources = source_tables(raw)
+    if raw and not (DATA_DIR / RAW_DATA_FILE).exists():
+        print(f"Error: {DATA_DIR / RAW_DATA_FILE} not found")
+        sys.exit(1)
     
-    # Connect to database (creates it if it doesn't exist)
-    conn = sqlite3.connect(db_path)
+    checksums = source_checksums(DATA_DIR, sources)
+    stored = None if force else stored_checksums(db_path)
+    matrix_digest = stored.pop(MATRIX_METADATA_SOURCE, None) if stored is not None else None
+    
+    if stored == checksums and matrix_digest is not None:
+        print(f"Database at {db_path} is up to date, skipping rebuild")
+        if not breeding_matrix_is_current(db_path, matrix_digest):
+            conn = sqlite3.connect(db_path)
+            try:
+                create_breeding_matrix(conn.cursor(), matrix_path_for(db_path))
+            finally:
+                conn.close()
+        return
+    
+    if stored is None:
+        print(f"Creating database at: {db_path}")
+        tables = set(TABLE_ORDER)
+    else:
+        # Sources of the other build mode count too, so switching modes reloads their tables
+        all_sources = {**source_tables(raw=not raw), **sources}
+        changed = [name for name in all_sources if stored.get(name) != checksums.get(name)]
+        print(f"Updating database at: {db_path} (changed: {', '.join(changed)})")
+        tables = set()
+        for name in changed:
+            for table in all_sources[name]:
+                tables.add(table)
+                tables.update(DEPENDENT_TABLES.get(table, []))
+    
+    # Build into separate files and swap them in at the end, so a running app
+    # never reads a half-written database or matrix
+    tmp_path = db_path + '.tmp'
+    matrix_path = matrix_path_for(db_path)
+    tmp_matrix_path = matrix_path.with_name(matrix_path.name + '.tmp')
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    if stored is not None:
+        shutil.copyfile(db_path, tmp_path)
+    
+    conn = sqlite3.connect(tmp_path)
     cursor = conn.cursor()
     
+    # The build is one transaction that is simply rerun if it fails,
+    # so skip the rollback journal and fsyncs while loading
+    cursor.execute('PRAGMA journal_mode = OFF')
+    cursor.execute('PRAGMA synchronous = OFF')
+    
     try:
-        # Create tables
+        create_tables(cursor)
         
-        # Element table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS element (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE
-            )
-        ''')
+        # Clear the tables being reloaded, referencing tables first
+        clear_tables(cursor, tables)
         
-        # Suitability table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS suitability (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL UNIQUE
-            )
-        ''')
+        # Load data from JSON files
+        load_data_from_json(cursor, tables, raw)
         
-        # Pal table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS pal (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                no TEXT NOT NULL,
-                name TEXT NOT NULL,
-                image_url TEXT
-            )
-        ''')
+        # Indexes are cheaper to build once after the rows are in
+        create_indexes(cursor)
         
-        # Pal-Element relationship table (many-to-many)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS pal_element (
-                pal_id INTEGER NOT NULL,
-                element_id INTEGER NOT NULL,
-                PRIMARY KEY (pal_id, element_id),
-                FOREIGN KEY (pal_id) REFERENCES pal (id) ON DELETE CASCADE,
-                FOREIGN KEY (element_id) REFERENCES element (id) ON DELETE CASCADE
-            )
-        ''')
+        # Collect statistics so the planner picks the breeding indexes for OR filters
+        cursor.execute('ANALYZE')
         
-        # Work Suitability table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS work_suitability (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                pal_id INTEGER NOT NULL,
-                suitability_id INTEGER NOT NULL,
-                level INTEGER NOT NULL CHECK (level >= 1 AND level <= 5),
-                FOREIGN KEY (pal_id) REFERENCES pal (id) ON DELETE CASCADE,
-                FOREIGN KEY (suitability_id) REFERENCES suitability (id) ON DELETE CASCADE,
-                UNIQUE(pal_id, suitability_id)
-            )
-        ''')
-        
-        # Breeding Combination table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS breeding_combination (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                parent1_id INTEGER NOT NULL,
-                parent2_id INTEGER NOT NULL,
-                child_id INTEGER NOT NULL,
-                FOREIGN KEY (parent1_id) REFERENCES pal (id) ON DELETE CASCADE,
-                FOREIGN KEY (parent2_id) REFERENCES pal (id) ON DELETE CASCADE,
-                FOREIGN KEY (child_id) REFERENCES pal (id) ON DELETE CASCADE,
-                UNIQUE(parent1_id, parent2_id)
-            )
-        ''')
-        
-        # Load data from JSON files
-        load_data_from_json(cursor)
+        # Record what the database was built from, including the combinations
+        # the matrix must match, so readers check the matrix without rehashing
+        if matrix_digest is None or 'breeding_combination' in tables:
+            matrix_digest = database_combinations_digest(cursor)
+        save_checksums(cursor, {**checksums, MATRIX_METADATA_SOURCE: matrix_digest})
         
         # Commit changes
         conn.commit()
-        print("Database created successfully!")
+        cursor.execute('PRAGMA journal_mode = DELETE')
+        cursor.execute('PRAGMA synchronous = FULL')
+        
+        # Write the breeding matrix file next to the database
+        new_matrix = not breeding_matrix_is_current(db_path, matrix_digest)
+        if new_matrix:
+            create_breeding_matrix(cursor, tmp_matrix_path)
         
         # Show table information
         show_database_info(cursor)
+        conn.close()
+        
+        # The matrix is stamped with its combinations, so an app starting
+        # between the two renames rebuilds it in memory rather than misreading it
+        os.replace(tmp_path, db_path)
+        if new_matrix:
+            os.replace(tmp_matrix_path, matrix_path)
         
     except sqlite3.Error as e:
         print(f"Database error: {e}")
-        conn.rollback()
         sys.exit(1)
+    
+    except ValueError as e:
+        # Malformed or out-of-order raw dump
+        print(f"Error: {e}")
+        sys.exit(1)
+    
+    finally:
+        conn.close()
+        for path in (tmp_path, tmp_matrix_path):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    print("Database created successfully!")
+
+def create_tables(cursor):
+    """Create all tables if they don't exist yet"""
+    
+    # Element table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS element (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        )
+    ''')
+    
+    # Suitability table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS suitability (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        )
+    ''')
+    
+    # Pal table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            no TEXT NOT NULL,
+            name TEXT NOT NULL,
+            image_url TEXT
+        )
+    ''')
+    
+    # Pal-Element relationship table (many-to-many)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pal_element (
+            pal_id INTEGER NOT NULL,
+            element_id INTEGER NOT NULL,
+            PRIMARY KEY (pal_id, element_id),
+            FOREIGN KEY (pal_id) REFERENCES pal (id) ON DELETE CASCADE,
+            FOREIGN KEY (element_id) REFERENCES element (id) ON DELETE CASCADE
+        )
+    ''')
+    
+    # Work Suitability table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS work_suitability (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            pal_id INTEGER NOT NULL,
+            suitability_id INTEGER NOT NULL,
+            level INTEGER NOT NULL CHECK (level >= 1 AND level <= 5),
+            FOREIGN KEY (pal_id) REFERENCES pal (id) ON DELETE CASCADE,
+            FOREIGN KEY (suitability_id) REFERENCES suitability (id) ON DELETE CASCADE,
+            UNIQUE(pal_id, suitability_id)
+        )
+    ''')
+    
+    # Breeding Combination table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS breeding_combination (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            parent1_id INTEGER NOT NULL,
+            parent2_id INTEGER NOT NULL,
+            child_id INTEGER NOT NULL,
+            FOREIGN KEY (parent1_id) REFERENCES pal (id) ON DELETE CASCADE,
+            FOREIGN KEY (parent2_id) REFERENCES pal (id) ON DELETE CASCADE,
+            FOREIGN KEY (child_id) REFERENCES pal (id) ON DELETE CASCADE,
+            UNIQUE(parent1_id, parent2_id)
+        )
+    ''')
+    
+    # Build metadata table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS build_metadata (
+            source TEXT PRIMARY KEY,
+            checksum TEXT NOT NULL
+        )
+    ''')
+
+def source_tables(raw=False):
+    """Return {source file: [tables it fills]} for a JSON or raw build"""
+    sources = {name: [table] for name, table in SOURCE_TABLES.items()}
+    if raw:
+        # pals.json stays a source: its numbers and images override the dump's
+        del sources['breeding_combinations.json']
+        sources[RAW_DATA_FILE] = ['pal', 'breeding_combination']
+    return sources
+
+def source_checksums(data_dir, sources=SOURCE_TABLES):
+    """Return {source: checksum} for the source files that exist, plus the schema version"""
+    checksums = {'schema_version': str(SCHEMA_VERSION)}
+    for name in sources:
+        source_file = data_dir / name
+        if source_file.exists():
+            checksums[name] = file_checksum(source_file)
+    return checksums
+
+def file_checksum(path):
+    """SHA-256 of a file, read in chunks so large dumps are not held in memory"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def stored_checksums(db_path):
+    """Return the checksums recorded in an existing database, or None to force a full build"""
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        stored = dict(conn.execute('SELECT source, checksum FROM build_metadata').fetchall())
+    except sqlite3.Error:
+        return None
     finally:
         conn.close()
+    if stored.get('schema_version') != str(SCHEMA_VERSION):
+        return None
+    return stored
+
+def save_checksums(cursor, checksums):
+    """Replace the recorded source checksums"""
+    cursor.execute('DELETE FROM build_metadata')
+    cursor.executemany('INSERT INTO build_metadata (source, checksum) VALUES (?, ?)', checksums.items())
+
+def clear_tables(cursor, tables):
+    """Delete all rows from tables and restart their ids"""
+    for table in reversed(TABLE_ORDER):
+        if table in tables:
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.execute('DELETE FROM sqlite_sequence WHERE name = ?', (table,))
 
-def load_data_from_json(cursor):
-    """Load data from JSON files"""
+def load_data_from_json(cursor, tables=None, raw=False):
+    """Load data from JSON files in a single bulk pass, limited to the given tables"""
     
-    data_dir = Path("data")
+    if tables is None:
+        tables = set(TABLE_ORDER)
+    
+    data_dir = DATA_DIR
     if not data_dir.exists():
         print(f"Warning: {data_dir} directory not found. Please create it and add your JSON data files.")
         return
     
+    # Raw mode reads the dump once: pals come first and are held (they are few),
+    # then the combinations stream straight into the insert further down
+    raw_events = None
+    if raw and tables & {'pal', 'breeding_combination'}:
+        raw_file = data_dir / RAW_DATA_FILE
+        print(f"Streaming pals and breeding combinations from {raw_file}")
+        raw_events = iter_raw_data(raw_file)
+        raw_pals = []
+        first_combination = []
+        for path, item in raw_events:
+            if path == RAW_COMBINATIONS_PATH:
+                first_combination.append(item)
+                break
+            raw_pals.append(item)
+        raw_combinations = itertools.chain(first_combination, raw_combination_items(raw_events))
+    
     # Load elements
-    elements_file = data_dir / "elements.json"
-    if elements_file.exists():
-        print(f"Loading elements from {elements_file}")
-        with open(elements_file, 'r', encoding='utf-8') as f:
-            elements_data = json.load(f)
-            for element in elements_data:
-                cursor.execute('INSERT OR IGNORE INTO element (name) VALUES (?)', (element['name'],))
-        print(f"Loaded {len(elements_data)} elements")
-    else:
-        print(f"Warning: {elements_file} not found, skipping elements")
+    if 'element' in tables:
+        elements_file = data_dir / "elements.json"
+        if elements_file.exists():
+            print(f"Loading elements from {elements_file}")
+            with open(elements_file, 'r', encoding='utf-8') as f:
+                elements_data = json.load(f)
+            cursor.executemany('INSERT OR IGNORE INTO element (name) VALUES (?)',
+                               [(element['name'],) for element in elements_data])
+            print(f"Loaded {len(elements_data)} elements")
+        else:
+            print(f"Warning: {elements_file} not found, skipping elements")
     
     # Load suitabilities
-    suitabilities_file = data_dir / "suitabilities.json"
-    if suitabilities_file.exists():
-        print(f"Loading suitabilities from {suitabilities_file}")
-        with open(suitabilities_file, 'r', encoding='utf-8') as f:
-            suitabilities_data = json.load(f)
-            for suitability in suitabilities_data:
-                cursor.execute('INSERT OR IGNORE INTO suitability (name) VALUES (?)', (suitability['name'],))
-        print(f"Loaded {len(suitabilities_data)} suitabilities")
-    else:
-        print(f"Warning: {suitabilities_file} not found, skipping suitabilities")
+    if 'suitability' in tables:
+        suitabilities_file = data_dir / "suitabilities.json"
+        if suitabilities_file.exists():
+            print(f"Loading suitabilities from {suitabilities_file}")
+            with open(suitabilities_file, 'r', encoding='utf-8') as f:
+                suitabilities_data = json.load(f)
+            cursor.executemany('INSERT OR IGNORE INTO suitability (name) VALUES (?)',
+                               [(suitability['name'],) for suitability in suitabilities_data])
+            print(f"Loaded {len(suitabilities_data)} suitabilities")
+        else:
+            print(f"Warning: {suitabilities_file} not found, skipping suitabilities")
     
     # Load pals
-    pals_file = data_dir / "pals.json"
-    if pals_file.exists():
-        print(f"Loading pals from {pals_file}")
-        with open(pals_file, 'r', encoding='utf-8') as f:
-            pals_data = json.load(f)
-            for pal in pals_data:
-                cursor.execute(
-                    'INSERT OR IGNORE INTO pal (no, name, image_url) VALUES (?, ?, ?)',
-                    (pal.get('no'), pal['name'], pal.get('image_url'))
-                )
-        print(f"Loaded {len(pals_data)} pals")
-    else:
-        print(f"Warning: {pals_file} not found, skipping pals")
+    if 'pal' in tables and raw_events is not None:
+        pals_file = data_dir / "pals.json"
+        curated = []
+        if pals_file.exists():
+            with open(pals_file, 'r', encoding='utf-8') as f:
+                curated = json.load(f)
+        rows = raw_pal_rows(raw_pals, curated)
+        cursor.executemany('INSERT OR IGNORE INTO pal (no, name, image_url) VALUES (?, ?, ?)', rows)
+        print(f"Loaded {len(rows)} pals")
+    elif 'pal' in tables:
+        pals_file = data_dir / "pals.json"
+        if pals_file.exists():
+            print(f"Loading pals from {pals_file}")
+            with open(pals_file, 'r', encoding='utf-8') as f:
+                pals_data = json.load(f)
+            cursor.executemany(
+                'INSERT OR IGNORE INTO pal (no, name, image_url) VALUES (?, ?, ?)',
+                [(pal.get('no'), pal['name'], pal.get('image_url')) for pal in pals_data]
+            )
+            print(f"Loaded {len(pals_data)} pals")
+        else:
+            print(f"Warning: {pals_file} not found, skipping pals")
+    
+    # Build name -> id maps once instead of looking names up per row
+    pal_ids = name_to_id_map(cursor, 'pal')
+    element_ids = name_to_id_map(cursor, 'element')
+    suitability_ids = name_to_id_map(cursor, 'suitability')
     
     # Load pal-elements relationships
-    pal_elements_file = data_dir / "pal_elements.json"
-    if pal_elements_file.exists():
-        print(f"Loading pal-elements from {pal_elements_file}")
-        with open(pal_elements_file, 'r', encoding='utf-8') as f:
-            pal_elements_data = json.load(f)
-            for rel in pal_elements_data:
-                # Get pal_id by name
-                cursor.execute('SELECT id FROM pal WHERE name = ?', (rel['pal_name'],))
-                pal_result = cursor.fetchone()
-                if pal_result:
-                    pal_id = pal_result[0]
-                    # Get element_id by name
-                    cursor.execute('SELECT id FROM element WHERE name = ?', (rel['element_name'],))
-                    element_result = cursor.fetchone()
-                    if element_result:
-                        element_id = element_result[0]
-                        cursor.execute('INSERT OR IGNORE INTO pal_element (pal_id, element_id) VALUES (?, ?)', 
-                                     (pal_id, element_id))
-        print(f"Loaded {len(pal_elements_data)} pal-element relationships")
-    else:
-        print(f"Warning: {pal_elements_file} not found, skipping pal-elements")
+    if 'pal_element' in tables:
+        pal_elements_file = data_dir / "pal_elements.json"
+        if pal_elements_file.exists():
+            print(f"Loading pal-elements from {pal_elements_file}")
+            with open(pal_elements_file, 'r', encoding='utf-8') as f:
+                pal_elements_data = json.load(f)
+            rows = [
+                (pal_ids[rel['pal_name']], element_ids[rel['element_name']])
+                for rel in pal_elements_data
+                if rel['pal_name'] in pal_ids and rel['element_name'] in element_ids
+            ]
+            cursor.executemany('INSERT OR IGNORE INTO pal_element (pal_id, element_id) VALUES (?, ?)', rows)
+            print(f"Loaded {len(pal_elements_data)} pal-element relationships")
+        else:
+            print(f"Warning: {pal_elements_file} not found, skipping pal-elements")
     
     # Load work suitabilities
-    work_suitabilities_file = data_dir / "work_suitabilities.json"
-    if work_suitabilities_file.exists():
-        print(f"Loading work suitabilities from {work_suitabilities_file}")
-        with open(work_suitabilities_file, 'r', encoding='utf-8') as f:
-            work_suitabilities_data = json.load(f)
-            for ws in work_suitabilities_data:
-                # Get pal_id by name
-                cursor.execute('SELECT id FROM pal WHERE name = ?', (ws['pal_name'],))
-                pal_result = cursor.fetchone()
-                if pal_result:
-                    pal_id = pal_result[0]
-                    # Get suitability_id by name
-                    cursor.execute('SELECT id FROM suitability WHERE name = ?', (ws['suitability_name'],))
-                    suitability_result = cursor.fetchone()
-                    if suitability_result:
-                        suitability_id = suitability_result[0]
-                        cursor.execute('INSERT OR IGNORE INTO work_suitability (pal_id, suitability_id, level) VALUES (?, ?, ?)', 
-                                     (pal_id, suitability_id, ws['level']))
-        print(f"Loaded {len(work_suitabilities_data)} work suitabilities")
-    else:
-        print(f"Warning: {work_suitabilities_file} not found, skipping work suitabilities")
+    if 'work_suitability' in tables:
+        work_suitabilities_file = data_dir / "work_suitabilities.json"
+        if work_suitabilities_file.exists():
+            print(f"Loading work suitabilities from {work_suitabilities_file}")
+            with open(work_suitabilities_file, 'r', encoding='utf-8') as f:
+                work_suitabilities_data = json.load(f)
+            rows = [
+                (pal_ids[ws['pal_name']], suitability_ids[ws['suitability_name']], ws['level'])
+                for ws in work_suitabilities_data
+                if ws['pal_name'] in pal_ids and ws['suitability_name'] in suitability_ids
+            ]
+            cursor.executemany('INSERT OR IGNORE INTO work_suitability (pal_id, suitability_id, level) VALUES (?, ?, ?)', rows)
+            print(f"Loaded {len(work_suitabilities_data)} work suitabilities")
+        else:
+            print(f"Warning: {work_suitabilities_file} not found, skipping work suitabilities")
     
     # Load breeding combinations
-    breeding_combinations_file = data_dir / "breeding_combinations.json"
-    if breeding_combinations_file.exists():
-        print(f"Loading breeding combinations from {breeding_combinations_file}")
-        with open(breeding_combinations_file, 'r', encoding='utf-8') as f:
-            breeding_combinations_data = json.load(f)
-            for bc in breeding_combinations_data:
-                # Get parent1_id by name
-                cursor.execute('SELECT id FROM pal WHERE name = ?', (bc['parent1_name'],))
-                parent1_result = cursor.fetchone()
-                # Get parent2_id by name
-                cursor.execute('SELECT id FROM pal WHERE name = ?', (bc['parent2_name'],))
-                parent2_result = cursor.fetchone()
-                # Get child_id by name
-                cursor.execute('SELECT id FROM pal WHERE name = ?', (bc['child_name'],))
-                child_result = cursor.fetchone()
-                
-                if parent1_result and parent2_result and child_result:
-                    cursor.execute('INSERT OR IGNORE INTO breeding_combination (parent1_id, parent2_id, child_id) VALUES (?, ?, ?)', 
-                                 (parent1_result[0], parent2_result[0], child_result[0]))
-        print(f"Loaded {len(breeding_combinations_data)} breeding combinations")
-    else:
-        print(f"Warning: {breeding_combinations_file} not found, skipping breeding combinations")
+    if 'breeding_combination' in tables and raw_events is not None:
+        rows = (
+            (pal_ids[bc['parent1Name']], pal_ids[bc['parent2Name']], pal_ids[bc['childName']])
+            for bc in raw_combinations
+            if bc['parent1Name'] in pal_ids and bc['parent2Name'] in pal_ids and bc['childName'] in pal_ids
+        )
+        cursor.executemany('INSERT OR IGNORE INTO breeding_combination (parent1_id, parent2_id, child_id) VALUES (?, ?, ?)', rows)
+        print(f"Loaded {cursor.rowcount} breeding combinations")
+    elif 'breeding_combination' in tables:
+        breeding_combinations_file = data_dir / "breeding_combinations.json"
+        if breeding_combinations_file.exists():
+            print(f"Loading breeding combinations from {breeding_combinations_file}")
+            with open(breeding_combinations_file, 'r', encoding='utf-8') as f:
+                breeding_combinations_data = json.load(f)
+            rows = [
+                (pal_ids[bc['parent1_name']], pal_ids[bc['parent2_name']], pal_ids[bc['child_name']])
+                for bc in breeding_combinations_data
+                if bc['parent1_name'] in pal_ids and bc['parent2_name'] in pal_ids and bc['child_name'] in pal_ids
+            ]
+            cursor.executemany('INSERT OR IGNORE INTO breeding_combination (parent1_id, parent2_id, child_id) VALUES (?, ?, ?)', rows)
+            print(f"Loaded {len(breeding_combinations_data)} breeding combinations")
+        else:
+            print(f"Warning: {breeding_combinations_file} not found, skipping breeding combinations")
+
+def iter_raw_data(raw_file):
+    """Yield (path, item) for the pals and then the combinations in the raw dump"""
+    with open(raw_file, 'r', encoding='utf-8') as f:
+        yield from iter_arrays(f, [RAW_PALS_PATH, RAW_COMBINATIONS_PATH])
+
+def raw_combination_items(raw_events):
+    """Yield the remaining combination items, which must come after every pal"""
+    for path, item in raw_events:
+        if path != RAW_COMBINATIONS_PATH:
+            raise ValueError(f"{RAW_DATA_FILE} must list its pals before its combinations")
+        yield item
+
+def raw_pal_rows(raw_pals, curated):
+    """Return (no, name, image_url) rows for the pals in the raw dump.
+    
+    Pals also in the curated pals.json come first, in its order and with its
+    number and image, so their ids stay the same; new pals follow in dump
+    order with a number from sortNum (1201 -> "12B") and any image in static/.
+    """
+    in_dump = {pal['name'] for pal in raw_pals}
+    rows = [(pal.get('no'), pal['name'], pal.get('image_url')) for pal in curated if pal['name'] in in_dump]
+    known = {row[1] for row in rows}
+    for pal in raw_pals:
+        if pal['name'] in known:
+            continue
+        known.add(pal['name'])
+        rows.append((raw_pal_no(pal.get('sortNum')), pal['name'], find_pal_image(pal['name'])))
+    return rows
+
+def raw_pal_no(sort_num):
+    """Paldeck number from a raw sortNum; variants sort one after their base pal"""
+    if not sort_num:
+        return '-1'
+    sort_num = int(sort_num)
+    return f"{sort_num // 100}{'B' if sort_num % 100 else ''}"
+
+def find_pal_image(name):
+    """Return the static image path for a pal name, or '' if there is none"""
+    stem = name.replace(' ', '_')
+    for suffix in IMAGE_SUFFIXES:
+        if (STATIC_DIR / (stem + suffix)).exists():
+            return f"static/{stem}{suffix}"
+    return ''
+
+def name_to_id_map(cursor, table):
+    """Return {name: id} for a table, keeping the lowest id for duplicate names"""
+    cursor.execute(f'SELECT id, name FROM {table} ORDER BY id DESC')
+    return {name: row_id for row_id, name in cursor.fetchall()}
+
+def create_indexes(cursor):
+    """Create lookup indexes once the bulk load is done"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_pal_name ON pal (name)')
+    # Covering indexes for breeding lookups by child and by second parent;
+    # lookups by first parent use the UNIQUE(parent1_id, parent2_id) index
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_breeding_combination_child
+        ON breeding_combination (child_id, parent1_id, parent2_id)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_breeding_combination_parent2
+        ON breeding_combination (parent2_id, parent1_id, child_id)
+    ''')
+
+def create_breeding_matrix(cursor, matrix_path):
+    """Write the dense pair -> child matrix used by app.py for breeding lookups"""
+    cursor.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM pal')
+    size = cursor.fetchone()[0]
+    cursor.execute('SELECT parent1_id, parent2_id, child_id FROM breeding_combination ORDER BY id')
+    write_breeding_matrix(matrix_path, cursor.fetchall(), size)
+    print(f"Breeding matrix ({size}x{size}) written to: {matrix_path}")
+
+def database_combinations_digest(cursor):
+    """Hex combinations_digest() of the breeding combinations in the database"""
+    cursor.execute('SELECT parent1_id, parent2_id, child_id FROM breeding_combination ORDER BY id')
+    return combinations_digest(unique_combinations(cursor.fetchall())).hex()
+
+def breeding_matrix_is_current(db_path, matrix_digest):
+    """Check that the matrix file exists and carries the digest stamped in the database"""
+    try:
+        BreedingMatrix.load(matrix_path_for(db_path), bytes.fromhex(matrix_digest))
+    except (OSError, ValueError):
+        return False
+    return True
 
 def show_database_info(cursor):
     """Show information about the created database"""
@@ -251,4 +549,6 @@ def show_database_info(cursor):
         print(f"{table_name}: {count} records")
 
 if __name__ == "__main__":
-    create_database() 
\ No newline at end of file
+    # --force rebuilds every table even when no source file changed;
+    # --raw streams pals and breeding combinations from data/raw_data.json
+    create_database(force='--force' in sys.argv[1:], raw='--raw' in sys.argv[1:]) 
\ No newline at end of file
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""Background breeding jobs run on a pool of worker processes.
+
+A job server process owns the worker pool and the job table. app.py starts
+it once the in-memory tables are loaded, so the server and its workers are
+forked with the tables already in memory. Under gunicorn it is started in the
+master, and every gunicorn worker submits to and polls the same server.
+
+A job runs within its time budget. If it goes over, or is cancelled while
+running, its worker process is killed and replaced. Finished jobs are kept
+for JOB_RESULT_TTL seconds. Needs the fork start method (Linux).
+"""
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from multiprocessing import connection
+from multiprocessing.managers import BaseManager
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', str(os.cpu_count() or 1)))
+JOB_TIME_BUDGET = float(os.getenv('JOB_TIME_BUDGET', '30'))
+MAX_JOB_TIME_BUDGET = float(os.getenv('MAX_JOB_TIME_BUDGET', '300'))
+MAX_QUEUED_JOBS = int(os.getenv('MAX_QUEUED_JOBS', '1000'))
+JOB_RESULT_TTL = float(os.getenv('JOB_RESULT_TTL', '600'))
+
+FINISHED = ('done', 'failed', 'cancelled', 'timed_out')
+
+# Longest the dispatcher sleeps between checks for expired jobs and a dead parent process
+DISPATCH_INTERVAL = 1.0
+
+# Signals gunicorn handles in the master; the job server must not inherit its handlers
+_RESET_SIGNALS = ('SIGINT', 'SIGTERM', 'SIGHUP', 'SIGQUIT', 'SIGUSR1', 'SIGUSR2', 'SIGWINCH', 'SIGTTIN', 'SIGTTOU', 'SIGCHLD')
+
+_context = multiprocessing.get_context('fork')
+
+
+class Job:
+    __slots__ = ('id', 'type', 'params', 'time_budget', 'status', 'result', 'error',
+                 'submitted', 'started', 'finished')
+
+    def __init__(self, job_type, params, time_budget):
+        self.id = uuid.uuid4().hex
+        self.type = job_type
+        self.params = params
+        self.time_budget = time_budget
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+
+    def as_dict(self):
+        now = time.monotonic()
+        job = {
+            'job_id': self.id,
+            'type': self.type,
+            'status': self.status,
+            'time_budget': self.time_budget,
+            'queued_seconds': round((self.started or self.finished or now) - self.submitted, 3),
+            'run_seconds': round((self.finished or now) - self.started, 3) if self.started else None
+        }
+        if self.status == 'done':
+            job['result'] = self.result
+        elif self.error is not None:
+            job['error'] = self.error
+        return job
+
+
+class Worker:
+    __slots__ = ('process', 'conn', 'job', 'deadline')
+
+    def __init__(self, handlers):
+        self.conn, child_conn = _context.Pipe()
+        self.process = _context.Process(target=_worker_main, args=(child_conn, handlers), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.job = None
+        self.deadline = None
+
+    def stop(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+def _worker_main(conn, handlers):
+    """Run the jobs sent over conn until the job server goes away"""
+    # Workers forked later hold copies of this pipe, so it may never report EOF
+    server_pid = os.getppid()
+    while True:
+        if not conn.poll(DISPATCH_INTERVAL):
+            if os.getppid() != server_pid:
+                return
+            continue
+        try:
+            job_id, job_type, params = conn.recv()
+        except EOFError:
+            return
+        try:
+            message = (job_id, 'done', handlers[job_type](**params))
+        except Exception as error:
+            message = (job_id, 'failed', f"{type(error).__name__}: {error}")
+        conn.send(message)
+
+
+class JobService:
+    """Job table and worker pool, living in the job server process.
+
+    Request threads only change job state under the lock; a dispatcher thread
+    starts, collects, kills and replaces the worker processes.
+    """
+
+    def __init__(self, handlers, workers=JOB_WORKERS, parent_pid=None):
+        self.handlers = handlers
+        self.parent_pid = parent_pid if parent_pid is not None else os.getppid()
+        self._jobs = {}
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._wake_reader, self._wake_writer = _context.Pipe(duplex=False)
+        self._workers = [Worker(handlers) for _ in range(max(1, workers))]
+        threading.Thread(target=self._dispatch, daemon=True).start()
+
+    def submit(self, job_type, params, time_budget):
+        """Queue a job and return it, or None when the queue is full"""
+        with self._lock:
+            if len(self._queue) >= MAX_QUEUED_JOBS:
+                return None
+            job = Job(job_type, params, time_budget)
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._wake()
+            return job.as_dict()
+
+    def get(self, job_id, wait=0):
+        """Return the job, waiting up to wait seconds for it to finish; None if unknown"""
+        deadline = time.monotonic() + wait
+        with self._changed:
+            job = self._jobs.get(job_id)
+            while job is not None and job.status not in FINISHED:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+            return job.as_dict() if job is not None else None
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job and return it; None if unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            if job.status == 'queued':
+                self._queue.remove(job)
+            if job.status in ('queued', 'running'):
+                # A running job's worker is killed by the dispatcher
+                self._finish(job, 'cancelled')
+                self._wake()
+            return job.as_dict()
+
+    def _wake(self):
+        self._wake_writer.send(None)
+
+    def _finish(self, job, status, value=None):
+        if job.status in FINISHED:
+            return  # e.g. a result arriving just after the job was cancelled
+        job.status = status
+        job.finished = time.monotonic()
+        if status == 'done':
+            job.result = value
+        else:
+            job.error = value
+        job.params = None
+        self._changed.notify_all()
+
+    def _parent_alive(self):
+        try:
+            os.kill(self.parent_pid, 0)
+        except ProcessLookupError:
+            return False
+        return True
+
+    def _dispatch(self):
+        while self._parent_alive():
+            busy = [worker for worker in self._workers if worker.job is not None]
+            now = time.monotonic()
+            timeout = min([DISPATCH_INTERVAL] + [max(0.0, worker.deadline - now) for worker in busy])
+            ready = connection.wait([self._wake_reader] + [worker.conn for worker in busy], timeout)
+            while self._wake_reader.poll():
+                self._wake_reader.recv()
+
+            now = time.monotonic()
+            dead = []
+            with self._lock:
+                for worker in busy:
+                    job = worker.job
+                    if worker.conn in ready:
+                        try:
+                            _, status, value = worker.conn.recv()
+                        except (EOFError, OSError):
+                            self._finish(job, 'failed', 'Worker process exited')
+                            dead.append(worker)
+                        else:
+                            self._finish(job, status, value)
+                        worker.job = None
+                    elif job.status == 'cancelled':
+                        worker.job = None
+                        dead.append(worker)
+                    elif now >= worker.deadline:
+                        self._finish(job, 'timed_out', f"Exceeded time budget of {job.time_budget:g}s")
+                        worker.job = None
+                        dead.append(worker)
+
+            # Fork replacements outside the lock, so no request thread holds it in the child
+            for worker in dead:
+                worker.stop()
+                self._workers[self._workers.index(worker)] = Worker(self.handlers)
+
+            with self._lock:
+                for worker in self._workers:
+                    if worker.job is None and self._queue:
+                        job = self._queue.popleft()
+                        job.status = 'running'
+                        job.started = time.monotonic()
+                        worker.job = job
+                        worker.deadline = job.started + job.time_budget
+                        worker.conn.send((job.id, job.type, job.params))
+                self._expire(now)
+                self._changed.notify_all()
+        # The process that started the server is gone
+        os._exit(0)
+
+    def _expire(self, now):
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished is not None and now - job.finished > JOB_RESULT_TTL]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+class JobManager(BaseManager):
+    pass
+
+
+_service = None
+
+
+def _get_service():
+    return _service
+
+
+JobManager.register('jobs', callable=_get_service, exposed=('submit', 'get', 'cancel'))
+
+
+class JobServer:
+    """A running job server, as returned by start_server()"""
+
+    def __init__(self, address, pid):
+        self.address = address
+        self.pid = pid
+
+    def shutdown(self):
+        """Stop the server; its workers exit once it is gone"""
+        try:
+            os.kill(self.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        try:
+            os.unlink(self.address)
+        except FileNotFoundError:
+            pass
+
+
+def _serve(address, handlers, workers, parent_pid, ready_fd):
+    global _service
+    for name in _RESET_SIGNALS:
+        signal.signal(getattr(signal, name), signal.SIG_DFL)
+    _service = JobService(handlers, workers, parent_pid)
+    server = JobManager(address=address, ctx=_context).get_server()
+    # The workers hold copies of ready_fd too, so the pid is newline-terminated rather than read to EOF
+    os.write(ready_fd, f"{os.getpid()}\n".encode())
+    os.close(ready_fd)
+    server.serve_forever()
+
+
+def start_server(handlers, workers=JOB_WORKERS):
+    """Fork the job server and return a JobServer once it is accepting connections.
+
+    handlers maps each job type to a function called with the job's params
+    as keyword arguments in a worker process, returning a picklable result.
+    The server forks twice into its own session, so it is not a child that
+    gunicorn's master would reap as a worker or a terminal's Ctrl-C would
+    reach, and exits by itself when the calling process is gone.
+    """
+    address = connection.arbitrary_address('AF_UNIX')
+    parent_pid = os.getpid()
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            if os.fork() == 0:
+                os.setsid()
+                _serve(address, handlers, workers, parent_pid, write_fd)
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    try:
+        os.waitpid(pid, 0)
+    except ChildProcessError:
+        pass  # Already reaped by a SIGCHLD handler, e.g. gunicorn's
+    with os.fdopen(read_fd, 'rb') as ready:
+        server_pid = ready.readline()
+    if not server_pid:
+        raise RuntimeError("Job server failed to start")
+    return JobServer(address, int(server_pid))
+
+
+def connect(address):
+    """Return a proxy to the JobService of the server at address.
+
+    The authentication key is inherited from the process that started the
+    server, so this works in that process and any forked from it.
+    """
+    manager = JobManager(address=address, ctx=_context)
+    manager.connect()
+    return manager.jobs()
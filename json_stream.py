@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Incremental reader for the items of large arrays nested in a JSON document.
+
+iter_arrays() yields array items one at a time while reading the file in
+chunks, so memory stays bounded by the largest single item rather than the
+document. Values outside the requested arrays are skipped without parsing.
+"""
+import json
+import re
+
+CHUNK_SIZE = 1 << 16
+
+# Characters that matter when scanning past a value, outside and inside strings
+_STRUCTURE = re.compile(r'[\[\]{}"]')
+_STRING_END = re.compile(r'["\\]')
+_SCALAR_END = re.compile(r'[,\]}\s]')
+_WHITESPACE = ' \t\r\n'
+
+
+class _Reader:
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+
+    def _more(self):
+        """Append the next chunk, dropping everything before pos; False at end of input"""
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more():
+                raise ValueError("Unexpected end of JSON input")
+
+    def take(self, expected=None):
+        """Consume and return the next non-whitespace character"""
+        char = self.peek()
+        if expected is not None and char not in expected:
+            raise ValueError(f"Expected one of {expected!r} but found {char!r}")
+        self.pos += 1
+        return char
+
+    def _value_end(self, keep=True):
+        """Return the offset just past the value starting at pos.
+
+        With keep=False the scanned text may be dropped from the buffer while
+        reading more input, which is how skipped values stay out of memory.
+        """
+        self.peek()
+        i = self.pos
+        depth = 0
+        in_string = False
+        scalar = self.buf[i] not in '{["'
+        while True:
+            if scalar:
+                match = _SCALAR_END.search(self.buf, i)
+            elif in_string:
+                match = _STRING_END.search(self.buf, i)
+            else:
+                match = _STRUCTURE.search(self.buf, i)
+
+            if match is None or (in_string and match.group() == '\\' and match.end() >= len(self.buf)):
+                # Need more input; keep an escape's backslash so the next pass sees the pair
+                i = len(self.buf) if match is None else match.start()
+                if not keep:
+                    self.pos = i
+                offset = self.pos
+                if not self._more():
+                    if scalar:
+                        return len(self.buf)
+                    raise ValueError("Unexpected end of JSON input")
+                i -= offset
+                continue
+
+            char = match.group()
+            i = match.end()
+            if scalar:
+                return match.start()
+            if in_string:
+                if char == '\\':
+                    i += 1  # Skip the escaped character
+                else:
+                    in_string = False
+                    if depth == 0:
+                        return i
+            elif char == '"':
+                in_string = True
+            elif char in '{[':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return i
+
+    def read_value(self):
+        end = self._value_end()
+        value = json.loads(self.buf[self.pos:end])
+        self.pos = end
+        return value
+
+    def skip_value(self):
+        self.pos = self._value_end(keep=False)
+
+
+def _walk(reader, path, wanted, prefixes):
+    if path in wanted:
+        reader.take('[')
+        if reader.peek() == ']':
+            reader.take()
+            return
+        while True:
+            yield path, reader.read_value()
+            if reader.take(',]') == ']':
+                return
+    elif path in prefixes and reader.peek() == '{':
+        reader.take()
+        if reader.peek() == '}':
+            reader.take()
+            return
+        while True:
+            key = reader.read_value()
+            reader.take(':')
+            yield from _walk(reader, path + (key,), wanted, prefixes)
+            if reader.take(',}') == '}':
+                return
+    else:
+        reader.skip_value()
+
+
+def iter_arrays(f, paths, chunk_size=CHUNK_SIZE):
+    """Yield (path, item) for each item of the arrays at the given key paths.
+
+    f is a text file and paths are tuples of object keys, e.g.
+    ('palArraySchema', 'pals'). Items come in document order.
+    """
+    wanted = {tuple(path) for path in paths}
+    prefixes = {path[:length] for path in wanted for length in range(len(path))}
+    yield from _walk(_Reader(f, chunk_size), (), wanted, prefixes)
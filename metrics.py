@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+"""Request, SQL and template instrumentation for app.py, exposed at /metrics.
+
+Off unless METRICS_ENABLED=1. While off, no hooks are registered and
+db_connection() hands out plain connections, so the cost is one flag check.
+SLOW_REQUEST_MS=n (0 disables) logs requests slower than n milliseconds with
+their query count, SQL time and template time, and also turns the hooks on.
+
+Metrics are kept per process: with several gunicorn workers each scrape sees
+the worker that answered it.
+"""
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+from flask import request, before_render_template, template_rendered
+
+ENABLED = os.getenv('METRICS_ENABLED', '0') == '1'
+SLOW_REQUEST_MS = float(os.getenv('SLOW_REQUEST_MS', '0'))
+INSTRUMENTED = ENABLED or SLOW_REQUEST_MS > 0
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64)
+
+# Longest SQL text used as a statement label
+STATEMENT_LABEL_LENGTH = 80
+# IN (?, ?, ...) lists of any length share one label
+PLACEHOLDER_LIST = re.compile(r'\(\?(?:\s*,\s*\?)+\)')
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, in the Prometheus text format"""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le=bound)} {count}")
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le='+Inf')} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {series[-2]}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-1]:.6f}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter per label set"""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value:g}")
+        return lines
+
+
+class CacheStats:
+    """Hit, miss, coalesced and eviction counts and sizes of registered caches.
+
+    Read from each cache's stats() at scrape time; the caches keep their own
+    counters whether or not metrics are enabled.
+    """
+
+    def __init__(self):
+        self._caches = {}
+
+    def register(self, name, cache):
+        self._caches[name] = cache
+
+    def render(self):
+        stats = sorted((name, cache.stats()) for name, cache in self._caches.items())
+        lines = ["# HELP pals_cache_requests_total Cache lookups by cache and result.",
+                 "# TYPE pals_cache_requests_total counter"]
+        for name, values in stats:
+            for result in ('hits', 'misses', 'coalesced'):
+                lines.append(f"pals_cache_requests_total{_labels(('cache', 'result'), (name, result))} {values[result]}")
+        lines += ["# HELP pals_cache_evictions_total Entries evicted to stay within the size limit.",
+                  "# TYPE pals_cache_evictions_total counter"]
+        for name, values in stats:
+            lines.append(f"pals_cache_evictions_total{_labels(('cache',), (name,))} {values['evictions']}")
+        for metric, key, help_text in (('pals_cache_entries', 'size', 'Entries currently cached.'),
+                                       ('pals_cache_max_entries', 'maxsize', 'Size limit of each cache.')):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+            for name, values in stats:
+                lines.append(f"{metric}{_labels(('cache',), (name,))} {values[key]}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, le=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+requests_total = Counter(
+    'pals_http_requests_total', 'HTTP requests by route, method and status.',
+    ('endpoint', 'method', 'status'))
+request_duration = Histogram(
+    'pals_http_request_duration_seconds', 'Time to build each response, by route.',
+    ('endpoint', 'method'))
+request_queries = Histogram(
+    'pals_request_sql_queries', 'SQL statements executed per request, by route.',
+    ('endpoint',), COUNT_BUCKETS)
+sql_duration = Histogram(
+    'pals_sql_query_duration_seconds', 'Time to execute and fetch each SQL statement.',
+    ('statement',))
+sql_rows = Counter(
+    'pals_sql_rows_total', 'Rows fetched, by SQL statement.', ('statement',))
+template_duration = Histogram(
+    'pals_template_render_seconds', 'Template render time, by template.', ('template',))
+
+caches = CacheStats()
+
+REGISTRY = (requests_total, request_duration, request_queries, sql_duration, sql_rows, template_duration, caches)
+
+# Per-thread state of the request being served
+_local = threading.local()
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def register_cache(name, cache):
+    """Report a cache with a stats() method (see breeding.PathCache) at /metrics"""
+    caches.register(name, cache)
+
+
+def statement_label(sql):
+    label = PLACEHOLDER_LIST.sub('(?, ...)', ' '.join(sql.split()))
+    if len(label) > STATEMENT_LABEL_LENGTH:
+        label = label[:STATEMENT_LABEL_LENGTH - 3] + '...'
+    return label
+
+
+class InstrumentedCursor:
+    """Cursor proxy timing fetches; the execute time is added to the first fetch"""
+
+    def __init__(self, cursor, label, execute_seconds):
+        self._cursor = cursor
+        self._label = label
+        self._pending = execute_seconds
+
+    def _record(self, start, rows):
+        elapsed = time.perf_counter() - start + self._pending
+        self._pending = 0.0
+        sql_duration.observe((self._label,), elapsed)
+        sql_rows.inc((self._label,), rows)
+        state = getattr(_local, 'state', None)
+        if state is not None:
+            state['sql_seconds'] += elapsed
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._record(start, len(rows))
+        return rows
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._record(start, row is not None)
+        return row
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Connection proxy counting and timing every execute()"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        cursor = self._conn.execute(sql, parameters)
+        elapsed = time.perf_counter() - start
+        state = getattr(_local, 'state', None)
+        if state is not None:
+            state['queries'] += 1
+        return InstrumentedCursor(cursor, statement_label(sql), elapsed)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _endpoint_label():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def _start_request():
+    _local.state = {'start': time.perf_counter(), 'queries': 0, 'sql_seconds': 0.0, 'template_seconds': 0.0}
+
+
+def _finish_request(app, response):
+    state = getattr(_local, 'state', None)
+    if state is None:
+        return response
+    _local.state = None
+    elapsed = time.perf_counter() - state['start']
+    endpoint = _endpoint_label()
+
+    if ENABLED:
+        requests_total.inc((endpoint, request.method, str(response.status_code)))
+        request_duration.observe((endpoint, request.method), elapsed)
+        request_queries.observe((endpoint,), state['queries'])
+
+    if SLOW_REQUEST_MS > 0 and elapsed * 1000 >= SLOW_REQUEST_MS:
+        app.logger.warning(
+            "Slow request: %s %s -> %s in %.1f ms (%d queries, %.1f ms SQL, %.1f ms templates)",
+            request.method, request.full_path.rstrip('?'), response.status_code, elapsed * 1000,
+            state['queries'], state['sql_seconds'] * 1000, state['template_seconds'] * 1000)
+    return response
+
+
+def _template_started(sender, template, context, **extra):
+    _local.template_start = time.perf_counter()
+
+
+def _template_finished(sender, template, context, **extra):
+    start = getattr(_local, 'template_start', None)
+    if start is None:
+        return
+    _local.template_start = None
+    elapsed = time.perf_counter() - start
+    if ENABLED:
+        template_duration.observe((template.name or 'string',), elapsed)
+    state = getattr(_local, 'state', None)
+    if state is not None:
+        state['template_seconds'] += elapsed
+
+
+def init_app(app):
+    """Register the request and template hooks when instrumentation is on"""
+    if not INSTRUMENTED:
+        return
+    app.before_request(_start_request)
+    app.after_request(lambda response: _finish_request(app, response))
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Pal name search index used by the /api/search endpoint in app.py"""
+from collections import defaultdict
+
+# Shortest query that also gets typo-tolerant trigram matches
+MIN_FUZZY_LENGTH = 3
+# Share of the query's trigrams a name must contain to count as a fuzzy match
+MIN_FUZZY_SIMILARITY = 0.4
+
+# Match kinds, best first
+EXACT, NAME_PREFIX, WORD_PREFIX, SUBSTRING, FUZZY = range(5)
+
+
+def trigrams(text):
+    """Return the set of padded character trigrams of text"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrieNode:
+    __slots__ = ('children', 'pal_ids')
+
+    def __init__(self):
+        self.children = {}
+        self.pal_ids = set()  # Pals with a word starting with the prefix ending here
+
+
+class PalSearchIndex:
+    """Prefix trie and trigram index over pal names, with element and work filters.
+
+    Built from the pal, element and work suitability tables.
+    """
+
+    def __init__(self, pals):
+        # pals: {pal_id: pal_dict} where pal_dict has 'name', 'no', 'elements'
+        # (list of names) and 'work_suitabilities' ({name: level})
+        self.pals = pals
+        self.names = {pal_id: pal['name'].lower() for pal_id, pal in pals.items()}
+        self.root = TrieNode()
+        self.trigram_index = defaultdict(set)
+        self.by_element = defaultdict(set)
+        self.by_work = defaultdict(dict)  # work name -> {pal_id: level}
+
+        for pal_id, pal in pals.items():
+            name = self.names[pal_id]
+            for word in name.split():
+                node = self.root
+                for char in word:
+                    node = node.children.setdefault(char, TrieNode())
+                    node.pal_ids.add(pal_id)
+            for gram in trigrams(name):
+                self.trigram_index[gram].add(pal_id)
+            for element in pal.get('elements', ()):
+                self.by_element[element.lower()].add(pal_id)
+            for work, level in pal.get('work_suitabilities', {}).items():
+                self.by_work[work.lower()][pal_id] = level
+
+        # Listing order when there is no query
+        self.ordered_ids = sorted(pals, key=lambda pal_id: (str(pals[pal_id]['no']), self.names[pal_id]))
+
+    def prefix_matches(self, prefix):
+        """Return ids of pals with a name word starting with prefix"""
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return set()
+        return node.pal_ids
+
+    def substring_matches(self, query):
+        """Return ids of pals whose name contains query anywhere"""
+        if len(query) < 3:
+            return {pal_id for pal_id, name in self.names.items() if query in name}
+        # Any name containing the query contains all of its inner trigrams
+        grams = [query[i:i + 3] for i in range(len(query) - 2)]
+        candidates = set(self.trigram_index.get(grams[0], ()))
+        for gram in grams[1:]:
+            candidates &= self.trigram_index.get(gram, set())
+        return {pal_id for pal_id in candidates if query in self.names[pal_id]}
+
+    def fuzzy_matches(self, query):
+        """Return {pal_id: similarity} for names sharing enough trigrams with query"""
+        grams = trigrams(query)
+        shared = defaultdict(int)
+        for gram in grams:
+            for pal_id in self.trigram_index.get(gram, ()):
+                shared[pal_id] += 1
+        return {
+            pal_id: count / len(grams)
+            for pal_id, count in shared.items()
+            if count / len(grams) >= MIN_FUZZY_SIMILARITY
+        }
+
+    def allowed_ids(self, elements=(), works=()):
+        """Return ids passing every filter, or None when there are no filters.
+
+        works is a list of (work name, minimum level) pairs.
+        """
+        allowed = None
+        for element in elements:
+            matching = self.by_element.get(element.lower(), set())
+            allowed = matching if allowed is None else allowed & matching
+        for work, min_level in works:
+            levels = self.by_work.get(work.lower(), {})
+            matching = {pal_id for pal_id, level in levels.items() if level >= min_level}
+            allowed = matching if allowed is None else allowed & matching
+        return allowed
+
+    def search(self, query, elements=(), works=(), limit=10):
+        """Return (ranked pal ids, total matches) for a query and filters.
+
+        Exact names rank first, then names starting with the query, names with
+        a later word starting with it, names containing it, and finally
+        typo-tolerant trigram matches by similarity.
+        """
+        query = ' '.join(query.lower().split())
+        allowed = self.allowed_ids(elements, works)
+
+        if not query:
+            matches = [pal_id for pal_id in self.ordered_ids if allowed is None or pal_id in allowed]
+            return matches[:limit], len(matches)
+
+        ranks = {}
+        words = query.split()
+        # Every query word must prefix some word of the name
+        candidates = self.prefix_matches(words[0])
+        for word in words[1:]:
+            candidates = candidates & self.prefix_matches(word)
+        for pal_id in candidates:
+            name = self.names[pal_id]
+            if name == query:
+                ranks[pal_id] = (EXACT, 0)
+            elif name.startswith(query):
+                ranks[pal_id] = (NAME_PREFIX, 0)
+            else:
+                ranks[pal_id] = (WORD_PREFIX, 0)
+
+        for pal_id in self.substring_matches(query):
+            ranks.setdefault(pal_id, (SUBSTRING, 0))
+
+        if len(query) >= MIN_FUZZY_LENGTH:
+            for pal_id, similarity in self.fuzzy_matches(query).items():
+                if pal_id not in ranks:
+                    ranks[pal_id] = (FUZZY, -similarity)
+
+        matches = [pal_id for pal_id in ranks if allowed is None or pal_id in allowed]
+        matches.sort(key=lambda pal_id: (ranks[pal_id], len(self.names[pal_id]), self.names[pal_id]))
+        return matches[:limit], len(matches)
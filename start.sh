@@ -3,5 +3,10 @@
 echo "Initializing db"
 python init_db.py
 
-echo "Starting flask"
-python app.py
\ No newline at end of file
+if [ "$FLASK_DEBUG" = "1" ]; then
+    echo "Starting flask development server"
+    exec python app.py
+fi
+
+echo "Starting gunicorn"
+exec gunicorn --config gunicorn.conf.py wsgi:app
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Work suitability index and team composition used by /api/team-composition in app.py"""
+from collections import defaultdict
+
+from breeding import mask_to_ids
+
+
+class WorkSuitabilityIndex:
+    """Per-suitability pal rankings and level bitmasks from the work_suitability table.
+
+    Bit n of a mask stands for pal id n, as in breeding.py.
+    """
+
+    def __init__(self, suitabilities, levels):
+        # suitabilities: iterable of names, levels: iterable of (pal_id, name, level)
+        self.names = {name.lower(): name for name in suitabilities}
+        self.pal_levels = defaultdict(dict)  # pal_id -> {suitability: level}
+        for pal_id, name, level in levels:
+            self.pal_levels[pal_id][name] = level
+
+        # suitability -> [(level, pal_id), ...] best first
+        self.ranked = {name: [] for name in self.names.values()}
+        for pal_id, pal_levels in self.pal_levels.items():
+            for name, level in pal_levels.items():
+                self.ranked.setdefault(name, []).append((level, pal_id))
+        for ranked in self.ranked.values():
+            ranked.sort(key=lambda item: (-item[0], item[1]))
+
+        # suitability -> [mask of pals at level >= n for n in 0..max level]
+        self.level_masks = {}
+        for name, ranked in self.ranked.items():
+            max_level = ranked[0][0] if ranked else 0
+            masks = [0] * (max_level + 1)
+            for level, pal_id in ranked:
+                for n in range(level + 1):
+                    masks[n] |= 1 << pal_id
+            self.level_masks[name] = masks
+
+    def resolve(self, name):
+        """Return the canonical suitability name for a case-insensitive name, or None"""
+        return self.names.get(name.lower())
+
+    def mask_at_least(self, name, min_level):
+        """Return the mask of pals with at least min_level in a suitability"""
+        masks = self.level_masks.get(name, [0])
+        if min_level < 0:
+            min_level = 0
+        return masks[min_level] if min_level < len(masks) else 0
+
+    def ranking(self, name, min_level=1, allowed=None):
+        """Return [(level, pal_id)] best first for pals meeting min_level and in allowed"""
+        ranked = []
+        for level, pal_id in self.ranked.get(name, ()):
+            if level < min_level:
+                break
+            if allowed is None or allowed >> pal_id & 1:
+                ranked.append((level, pal_id))
+        return ranked
+
+    def compose_team(self, requirements, allowed=None, preference=None):
+        """Find a smallest set of pals that together meet every requirement.
+
+        requirements is a list of (suitability, min_level) pairs and allowed an
+        optional mask of pals to choose from. Pals are grouped by which
+        requirements they meet, so the exact search runs over at most
+        2^len(requirements) groups rather than over pals. preference orders the
+        pals within a group (lower is better) and defaults to pal id.
+
+        Returns (team, unmet) where team is a list of pal ids (None when some
+        requirement can't be met) and unmet lists those requirement indexes.
+        """
+        if not requirements:
+            return [], []
+
+        # Which pals meet each requirement, and which requirements nobody meets
+        requirement_masks = []
+        for name, min_level in requirements:
+            mask = self.mask_at_least(name, min_level)
+            if allowed is not None:
+                mask &= allowed
+            requirement_masks.append(mask)
+        unmet = [index for index, mask in enumerate(requirement_masks) if not mask]
+        if unmet:
+            return None, unmet
+
+        # Best pal for each distinct set of met requirements
+        preference = preference or (lambda pal_id: pal_id)
+        candidates = 0
+        for mask in requirement_masks:
+            candidates |= mask
+        groups = {}
+        for pal_id in mask_to_ids(candidates):
+            covered = 0
+            for index, mask in enumerate(requirement_masks):
+                if mask >> pal_id & 1:
+                    covered |= 1 << index
+            current = groups.get(covered)
+            if current is None or preference(pal_id) < preference(current):
+                groups[covered] = pal_id
+        # A group meeting a subset of another group's requirements never helps
+        groups = {
+            covered: pal_id for covered, pal_id in groups.items()
+            if not any(other != covered and other & covered == covered for other in groups)
+        }
+
+        # Breadth-first search over covered-requirement sets finds the fewest pals
+        full = (1 << len(requirements)) - 1
+        previous = {0: None}  # covered set -> (previous covered set, pal id)
+        frontier = [0]
+        while full not in previous and frontier:
+            next_frontier = []
+            for covered in frontier:
+                for group, pal_id in groups.items():
+                    combined = covered | group
+                    if combined not in previous:
+                        previous[combined] = (covered, pal_id)
+                        next_frontier.append(combined)
+            frontier = next_frontier
+
+        team = []
+        covered = full
+        while previous[covered] is not None:
+            covered, pal_id = previous[covered]
+            team.append(pal_id)
+        team.reverse()
+        return team, []
+
@@ -0,0 +1,35 @@
+"""Shared fixtures: a database built by init_db.py and the breeding graph loaded from it."""
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / 'utils'))
+
+
+@pytest.fixture(scope='session')
+def db_path(tmp_path_factory):
+    import init_db
+
+    path = tmp_path_factory.mktemp('db') / 'pals.db'
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        # init_db.py reads data/ relative to the repo root
+        monkeypatch.chdir(ROOT_DIR)
+        monkeypatch.setenv('DATABASE_PATH', str(path))
+        init_db.create_database(force=True)
+    return path
+
+
+@pytest.fixture(scope='session')
+def graph(db_path):
+    import app
+
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return app.load_breeding_graph(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,121 @@
+"""breeding.BreedingGraph searches against the real breeding data, and PathCache."""
+import random
+import threading
+import time
+
+from breeding import COST_MODELS, PathCache
+
+
+def sample_boxes(graph, count=150, seed=0):
+    rng = random.Random(seed)
+    pal_ids = sorted(graph.pals)
+    return [rng.sample(pal_ids, rng.choice([2, 3, 4])) for _ in range(count)]
+
+
+def naive_closure(graph, box):
+    """Generation of every breedable pal, by rescanning all combinations until nothing new appears"""
+    generations = {pal_id: 0 for pal_id in box}
+    generation = 0
+    while True:
+        generation += 1
+        bred = {child_id for parent1_id, parent2_id, child_id in graph.combinations.values()
+                if parent1_id in generations and parent2_id in generations and child_id not in generations}
+        if not bred:
+            return generations
+        for child_id in bred:
+            generations[child_id] = generation
+
+
+def test_closure_matches_naive_fixpoint(graph):
+    for box in sample_boxes(graph, count=50):
+        assert graph.closure(box) == naive_closure(graph, box)
+
+
+def test_paths_are_valid(graph):
+    targets = sorted(graph.pals)
+    for box in sample_boxes(graph, count=50):
+        closure = graph.closure(box)
+        for cost in COST_MODELS:
+            paths = graph.find_paths(box, targets, cost)
+            for target_pal_id, path in paths.items():
+                if target_pal_id not in closure:
+                    assert path is None
+                    continue
+                if target_pal_id in box:
+                    assert path == []
+                    continue
+                generations = {pal_id: 0 for pal_id in box}
+                for generation, parent1_id, parent2_id, child_id in path:
+                    assert parent1_id in generations and parent2_id in generations
+                    assert graph.child_of(parent1_id, parent2_id) == child_id
+                    assert generation == max(generations[parent1_id], generations[parent2_id]) + 1
+                    generations.setdefault(child_id, generation)
+                assert path[-1][3] == target_pal_id
+                if cost == 'generations':
+                    assert path[-1][0] == closure[target_pal_id]
+
+
+def test_breeds_never_longer_than_generations_or_simulation(graph):
+    targets = sorted(graph.pals)
+    for box in sample_boxes(graph):
+        breeds = graph.find_paths(box, targets, 'breeds')
+        generations = graph.find_paths(box, targets, 'generations')
+        simulated = graph.simulated_paths(box, targets)
+        for target_pal_id in targets:
+            if generations[target_pal_id] is None:
+                assert breeds[target_pal_id] is None
+                continue
+            assert len(breeds[target_pal_id]) <= len(generations[target_pal_id])
+            if simulated[target_pal_id] is not None:
+                assert len(breeds[target_pal_id]) <= len(simulated[target_pal_id])
+
+
+def test_path_cache_drops_results_computed_before_clear():
+    cache = PathCache()
+    started = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def compute():
+        started.set()
+        release.wait(5)
+        return 'stale'
+
+    thread = threading.Thread(target=lambda: results.append(cache.get_or_compute('key', compute)))
+    thread.start()
+    assert started.wait(5)
+    cache.clear()
+    release.set()
+    thread.join(5)
+
+    # The caller still gets its result, but the cache does not keep it
+    assert results == ['stale']
+    assert len(cache) == 0
+    assert cache.get_or_compute('key', lambda: 'fresh') == 'fresh'
+    assert cache.get('key') == 'fresh'
+
+
+def test_path_cache_coalesces_concurrent_misses():
+    cache = PathCache()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return 'value'
+
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('key', compute)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    while cache.stats()['misses'] + cache.stats()['coalesced'] < len(threads):
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ['value'] * len(threads)
+    assert cache.stats()['coalesced'] == len(threads) - 1
@@ -0,0 +1,47 @@
+"""json_stream.iter_arrays against json.loads, with chunks small enough to split every token."""
+import io
+import json
+
+import pytest
+
+from json_stream import iter_arrays
+
+DOCUMENT = r'''
+{
+  "skipped": {"text": "a \"quoted\" ] } [ value \\", "nested": [[1, {"x": null}], []], "n": -1.5e3},
+  "data": {
+    "items": [
+      {"name": "Lamball", "escapes": "tab\tnewline\nslash\\quote\"unicodeé😀"},
+      [1, 2.5, -3e-2, true, false, null, "]", "}", ","],
+      "plain string",
+      {"empty": {}, "list": []},
+      0
+    ],
+    "other": ["x", {"y": "\\"}]
+  },
+  "empty": []
+}
+'''
+
+PATHS = [('data', 'items'), ('data', 'other'), ('empty',)]
+
+
+def expected_items():
+    document = json.loads(DOCUMENT)
+    return [(('data', 'items'), item) for item in document['data']['items']] + \
+        [(('data', 'other'), item) for item in document['data']['other']]
+
+
+@pytest.mark.parametrize('chunk_size', range(1, 8))
+def test_small_chunks_match_json_loads(chunk_size):
+    items = list(iter_arrays(io.StringIO(DOCUMENT), PATHS, chunk_size=chunk_size))
+    assert items == expected_items()
+
+
+def test_default_chunk_size_matches_json_loads():
+    assert list(iter_arrays(io.StringIO(DOCUMENT), PATHS)) == expected_items()
+
+
+def test_truncated_document_is_rejected():
+    with pytest.raises(ValueError):
+        list(iter_arrays(io.StringIO(DOCUMENT[:DOCUMENT.index('"plain')]), PATHS, chunk_size=3))
@@ -0,0 +1,28 @@
+"""Query plan check from utils/check_query_plans.py, run against a freshly built database."""
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from check_query_plans import SOURCE_FILES, collect_source_statements, find_full_scans
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture(scope='module')
+def conn(db_path):
+    conn = sqlite3.connect(db_path)
+    yield conn
+    conn.close()
+
+
+def test_app_queries_use_indexes(conn):
+    statements = collect_source_statements(ROOT_DIR / name for name in SOURCE_FILES)
+    assert statements
+    assert find_full_scans(conn, statements) == []
+
+
+def test_full_scan_is_reported(conn):
+    sql = 'SELECT child_id FROM breeding_combination bc WHERE bc.child_id + 0 = ?'
+    offenders = find_full_scans(conn, [('app.py', 1, sql)])
+    assert [(path, line) for path, line, _, _ in offenders] == [('app.py', 1)]
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""Benchmark every route in app.py against a freshly built database.
+
+Usage: python utils/bench.py [--mode client|http|both] [--requests 200]
+                             [--concurrency 8] [--box-sizes 5,20,50]
+                             [--scale 10 | --pal-scale N --combination-scale N]
+                             [--url http://host:port] [--json results.json]
+
+The database is built with init_db.py into a temporary directory, from data/
+or, with a scale option, from synthetic data made by utils/synthetic_data.py.
+Each route is then driven through Flask's test client (in-process, no network)
+and/or over HTTP by a thread pool against a local threaded server, or against
+an already running server with --url. Breeding requests use random boxes of
+the given sizes. Reports throughput and p50/p95/p99 latency per route.
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+import synthetic_data  # noqa: E402
+
+
+def build_database(data_dir, db_path):
+    """Build a database (and breeding matrix) from the JSON files in data_dir"""
+    import init_db
+    os.environ['DATABASE_PATH'] = str(db_path)
+    init_db.DATA_DIR = Path(data_dir)
+    # init_db.py prints a full schema dump; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        init_db.create_database(force=True)
+
+
+def make_workload(pal_ids, box_sizes, count, seed=0):
+    """Return {route name: [(method, path, json body), ...]} with count requests per route"""
+    rng = random.Random(seed)
+    ids = sorted(pal_ids)
+    workload = {
+        'GET /': [('GET', '/', None)] * count,
+        'GET /breeder': [('GET', '/breeder', None)] * count,
+        'GET /api/pals': [('GET', '/api/pals', None)] * count,
+        'GET /pal/<id>': [('GET', f'/pal/{rng.choice(ids)}', None) for _ in range(count)],
+        'GET /api/pal/<id>': [('GET', f'/api/pal/{rng.choice(ids)}', None) for _ in range(count)],
+    }
+    for box_size in box_sizes:
+        box_size = min(box_size, len(ids))
+        workload[f'POST /api/breeding-combinations (box {box_size})'] = [
+            ('POST', '/api/breeding-combinations', {'pal_ids': rng.sample(ids, box_size)})
+            for _ in range(count)
+        ]
+        workload[f'POST /api/check-breedable-pal (box {box_size})'] = [
+            ('POST', '/api/check-breedable-pal',
+             {'pal_ids': rng.sample(ids, box_size), 'target_pal_id': rng.choice(ids)})
+            for _ in range(count)
+        ]
+        workload[f'POST /api/check-breedable-pal cost=breeds (box {box_size})'] = [
+            ('POST', '/api/check-breedable-pal',
+             {'pal_ids': rng.sample(ids, box_size), 'target_pal_id': rng.choice(ids), 'cost': 'breeds'})
+            for _ in range(count)
+        ]
+    return workload
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def run_client(app, requests):
+    """Send requests one at a time through Flask's test client"""
+    client = app.test_client()
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for method, path, body in requests:
+        start = time.perf_counter()
+        response = client.open(path, method=method, json=body)
+        response.get_data()
+        latencies.append(time.perf_counter() - start)
+        errors += response.status_code >= 400
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def run_http(base_url, requests, concurrency):
+    """Send requests over HTTP from concurrency threads, each with a keep-alive connection"""
+    url = urlsplit(base_url)
+    local = threading.local()
+
+    def send(request):
+        method, path, body = request
+        if getattr(local, 'conn', None) is None:
+            local.conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        start = time.perf_counter()
+        try:
+            local.conn.request(method, path, body=payload, headers=headers)
+            response = local.conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            local.conn.close()
+            local.conn = None
+            status = 599
+        return time.perf_counter() - start, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(send, requests))
+    elapsed = time.perf_counter() - started
+    return summarize([latency for latency, _ in results],
+                     sum(status >= 400 for _, status in results), elapsed)
+
+
+@contextlib.contextmanager
+def local_server(app):
+    """Serve app on a free local port from a threaded WSGI server"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietRequestHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f'http://127.0.0.1:{server.server_port}'
+    finally:
+        server.shutdown()
+
+
+def print_report(title, results):
+    print(f"\n{title}")
+    width = max(len(name) for name in results)
+    print(f"{'route':<{width}}  {'reqs':>6} {'errs':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, stats in results.items():
+        print(f"{name:<{width}}  {stats['requests']:>6} {stats['errors']:>5} {stats['throughput']:>9.1f} "
+              f"{stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=('client', 'http', 'both'), default='both')
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=8, help='HTTP client threads')
+    parser.add_argument('--box-sizes', default='5,20,50', help='comma-separated owned box sizes')
+    parser.add_argument('--scale', type=int, default=None, help='scale pals and combinations by this factor')
+    parser.add_argument('--pal-scale', type=int, default=None)
+    parser.add_argument('--combination-scale', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--url', default=None, help='benchmark this running server instead of a local one')
+    parser.add_argument('--json', type=Path, default=None, help='also write the results to this file')
+    args = parser.parse_args()
+
+    box_sizes = [int(size) for size in args.box_sizes.split(',') if size.strip()]
+    pal_scale = args.pal_scale or args.scale or 1
+    combination_scale = args.combination_scale or args.scale or 1
+
+    with tempfile.TemporaryDirectory(prefix='pals-bench-') as work_dir:
+        work_dir = Path(work_dir)
+        data_dir = synthetic_data.DATA_DIR
+        if pal_scale > 1 or combination_scale > 1:
+            data_dir = work_dir / 'data'
+            pal_count, combination_count = synthetic_data.generate(
+                data_dir, pal_scale, combination_scale, args.seed)
+            print(f"Synthetic data: {pal_count} pals, {combination_count} breeding combinations")
+
+        started = time.perf_counter()
+        build_database(data_dir, work_dir / 'pals.db')
+        print(f"Built database in {time.perf_counter() - started:.2f}s")
+
+        # Run from the repo root so templates and static files resolve
+        os.chdir(ROOT_DIR)
+        import app as app_module
+        started = time.perf_counter()
+        app_module.preload()
+        print(f"Preloaded in-memory tables in {time.perf_counter() - started:.2f}s")
+        app = app_module.app
+
+        workload = make_workload(app_module.get_breeding_graph().pals, box_sizes, args.requests, args.seed)
+        report = {'pal_scale': pal_scale, 'combination_scale': combination_scale, 'results': {}}
+
+        if args.mode in ('client', 'both'):
+            results = {name: run_client(app, requests) for name, requests in workload.items()}
+            report['results']['client'] = results
+            print_report('Flask test client (sequential, in-process)', results)
+
+        if args.mode in ('http', 'both'):
+            with contextlib.ExitStack() as stack:
+                base_url = args.url or stack.enter_context(local_server(app))
+                results = {name: run_http(base_url, requests, args.concurrency)
+                           for name, requests in workload.items()}
+            report['results']['http'] = results
+            print_report(f'HTTP ({args.concurrency} concurrent clients, {base_url})', results)
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding='utf-8')
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == '__main__':
+    main()
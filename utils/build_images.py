@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Build thumbnail derivatives of the pal images in static/.
+
+Usage: python utils/build_images.py [--sizes 64,128] [--atlas 128]
+
+Writes square WebP thumbnails to static/thumbs/<size>/<name>.<hash>.webp,
+named by content hash so they can be cached as immutable, and a manifest at
+static/thumbs/manifest.json mapping each source image to its thumbnails.
+With --atlas, all thumbnails of that size are also packed into one sprite
+sheet whose per-image offsets are recorded in the manifest; app.py then
+draws the pal grid cards from it. Thumbnails no longer referenced by the
+manifest are removed.
+"""
+import argparse
+import hashlib
+import io
+import json
+import math
+from pathlib import Path
+
+from PIL import Image
+
+STATIC_DIR = Path(__file__).resolve().parent.parent / 'static'
+THUMBS_DIR = STATIC_DIR / 'thumbs'
+MANIFEST_PATH = THUMBS_DIR / 'manifest.json'
+DEFAULT_SIZES = (64, 128)
+IMAGE_SUFFIXES = ('.webp', '.png', '.jpg', '.jpeg')
+
+
+def make_thumbnail(image, size):
+    """Scale an image to fit a size x size transparent square"""
+    thumb = image.convert('RGBA')
+    thumb.thumbnail((size, size), Image.LANCZOS)
+    canvas = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    canvas.paste(thumb, ((size - thumb.width) // 2, (size - thumb.height) // 2))
+    return canvas
+
+
+def encode_webp(image):
+    buffer = io.BytesIO()
+    image.save(buffer, 'WEBP', quality=80, method=4)
+    return buffer.getvalue()
+
+
+def write_hashed(directory, stem, data):
+    """Write data as <stem>.<hash>.webp in directory and return its path"""
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}.webp"
+    if not path.exists():
+        path.write_bytes(data)
+    return path
+
+
+def build_atlas(thumbnails, size):
+    """Pack {source_name: thumbnail} into one sprite sheet and return its manifest entry"""
+    names = sorted(thumbnails)
+    columns = max(1, math.ceil(math.sqrt(len(names))))
+    rows = max(1, math.ceil(len(names) / columns))
+    sheet = Image.new('RGBA', (columns * size, rows * size), (0, 0, 0, 0))
+    offsets = {}
+    for index, name in enumerate(names):
+        x, y = (index % columns) * size, (index // columns) * size
+        sheet.paste(thumbnails[name], (x, y))
+        offsets[name] = [x, y]
+    path = write_hashed(THUMBS_DIR, f"atlas-{size}", encode_webp(sheet))
+    return {
+        'url': path.relative_to(STATIC_DIR).as_posix(),
+        'width': sheet.width,
+        'height': sheet.height,
+        'offsets': offsets
+    }
+
+
+def build(sizes, atlas_size=None):
+    """Build all thumbnails and the manifest, returning the manifest"""
+    sources = sorted(
+        path for path in STATIC_DIR.iterdir()
+        if path.is_file() and path.suffix.lower() in IMAGE_SUFFIXES
+    )
+    manifest = {'sizes': sorted(sizes), 'images': {}, 'atlases': {}}
+    atlas_thumbnails = {}
+    THUMBS_DIR.mkdir(parents=True, exist_ok=True)
+
+    for source in sources:
+        with Image.open(source) as image:
+            image.load()
+            entry = {}
+            for size in sizes:
+                thumbnail = make_thumbnail(image, size)
+                path = write_hashed(THUMBS_DIR / str(size), source.stem, encode_webp(thumbnail))
+                entry[str(size)] = path.relative_to(STATIC_DIR).as_posix()
+                if size == atlas_size:
+                    atlas_thumbnails[source.name] = thumbnail
+            if atlas_size and atlas_size not in sizes:
+                atlas_thumbnails[source.name] = make_thumbnail(image, atlas_size)
+        manifest['images'][source.name] = entry
+
+    if atlas_size:
+        manifest['atlases'][str(atlas_size)] = build_atlas(atlas_thumbnails, atlas_size)
+
+    # Remove derivatives of images that changed or were deleted
+    referenced = {url for entry in manifest['images'].values() for url in entry.values()}
+    referenced.update(atlas['url'] for atlas in manifest['atlases'].values())
+    for path in THUMBS_DIR.rglob('*.webp'):
+        if path.relative_to(STATIC_DIR).as_posix() not in referenced:
+            path.unlink()
+
+    tmp_path = MANIFEST_PATH.with_suffix('.json.tmp')
+    tmp_path.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding='utf-8')
+    tmp_path.replace(MANIFEST_PATH)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='comma-separated thumbnail sizes in pixels')
+    parser.add_argument('--atlas', type=int, default=None,
+                        help='also build a sprite atlas of thumbnails of this size')
+    args = parser.parse_args()
+
+    sizes = sorted({int(size) for size in args.sizes.split(',') if size.strip()})
+    manifest = build(sizes, args.atlas)
+    print(f"Built {len(sizes)} thumbnail size(s) for {len(manifest['images'])} images in {THUMBS_DIR}")
+    for size, atlas in manifest['atlases'].items():
+        print(f"Sprite atlas ({size}px): {atlas['url']} ({atlas['width']}x{atlas['height']})")
+
+
+if __name__ == '__main__':
+    main()
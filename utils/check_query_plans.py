@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""Check that no filtered SQL query in the app does a full scan of breeding_combination.
+
+Usage: DATABASE_PATH=data/pals.db python utils/check_query_plans.py [SOURCE ...]
+
+Every string passed to .execute() in the sources (app.py, teams.py and
+search.py by default; directly, through a variable, or
+through str.format for IN (...) placeholders) is run through EXPLAIN QUERY
+PLAN against the database. Exits with status 1 when a query with a WHERE clause
+scans breeding_combination; queries without one are whole-table loads and are
+expected to scan it.
+"""
+import ast
+import os
+import re
+import sqlite3
+import sys
+from pathlib import Path
+
+CHECKED_TABLE = 'breeding_combination'
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+# Modules the app runs queries from
+SOURCE_FILES = ('app.py', 'teams.py', 'search.py')
+
+
+def _string_value(node, assignments):
+    """Return the SQL text a node evaluates to, or None if it isn't a SQL string"""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.Name):
+        return assignments.get(node.id)
+    # '... IN ({}) ...'.format(placeholders, ...) -> one bound parameter per IN list
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr == 'format':
+        template = _string_value(node.func.value, assignments)
+        if template is not None:
+            return template.replace('{}', '?')
+    return None
+
+
+def collect_statements(source):
+    """Return [(line, sql)] for every SQL string executed in the given source"""
+    statements = []
+    for function in ast.walk(ast.parse(source)):
+        if not isinstance(function, ast.FunctionDef):
+            continue
+        assignments = {}
+        for node in ast.walk(function):
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                value = _string_value(node.value, assignments)
+                if value is not None:
+                    assignments[node.targets[0].id] = value
+        for node in ast.walk(function):
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) \
+                    and node.func.attr == 'execute' and node.args:
+                sql = _string_value(node.args[0], assignments)
+                if sql is not None:
+                    statements.append((node.lineno, sql))
+    return sorted(set(statements))
+
+
+def collect_source_statements(paths):
+    """Return [(path, line, sql)] for every SQL string executed in the given files"""
+    return [(path, line, sql)
+            for path in paths
+            for line, sql in collect_statements(Path(path).read_text(encoding='utf-8'))]
+
+
+def find_full_scans(conn, statements, table=CHECKED_TABLE):
+    """Return [(*location, sql, plan_detail)] for filtered statements that scan table.
+
+    statements are (*location, sql) tuples, e.g. (line, sql) or (path, line, sql).
+    """
+    alias_pattern = re.compile(r'\b' + table + r'\b(?:\s+(?:AS\s+)?(?!JOIN|WHERE|ON|ORDER|GROUP|LIMIT)(\w+))?', re.I)
+    offenders = []
+    for *location, sql in statements:
+        if not re.search(r'\bWHERE\b', sql, re.I):
+            continue
+        names = set()
+        for match in alias_pattern.finditer(sql):
+            names.add(table)
+            if match.group(1):
+                names.add(match.group(1))
+        if not names:
+            continue
+        plan = conn.execute('EXPLAIN QUERY PLAN ' + sql, [None] * sql.count('?')).fetchall()
+        for row in plan:
+            detail = row[-1]
+            words = detail.split()
+            if len(words) >= 2 and words[0] == 'SCAN' and words[1] in names:
+                offenders.append((*location, sql, detail))
+    return offenders
+
+
+def main():
+    paths = [Path(arg) for arg in sys.argv[1:]] or [ROOT_DIR / name for name in SOURCE_FILES]
+    db_path = os.getenv('DATABASE_PATH', 'data/pals.db')
+    if not os.path.exists(db_path):
+        print(f"Error: Database not found at {db_path}")
+        sys.exit(1)
+
+    statements = collect_source_statements(paths)
+    conn = sqlite3.connect(db_path)
+    try:
+        offenders = find_full_scans(conn, statements)
+    finally:
+        conn.close()
+
+    print(f"Checked {len(statements)} statements from {', '.join(str(path) for path in paths)}")
+    for path, line, sql, detail in offenders:
+        print(f"\n{path}:{line}: {detail}")
+        print('    ' + ' '.join(sql.split()))
+    if offenders:
+        print(f"\n{len(offenders)} statement(s) scan {CHECKED_TABLE}")
+        sys.exit(1)
+    print(f"No full scans of {CHECKED_TABLE}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Write precompressed .gz (and .br, if the brotli package is installed) variants
+of the text assets in static/, which app.py serves to clients that accept them.
+
+Usage: python utils/compress_static.py
+"""
+import gzip
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = Path(__file__).resolve().parent.parent / 'static'
+COMPRESSIBLE_SUFFIXES = ('.css', '.js', '.html', '.json', '.svg', '.txt')
+
+
+def write_if_smaller(path, data, compressed):
+    """Write a compressed variant only when it actually saves bytes"""
+    if len(compressed) < len(data):
+        path.write_bytes(compressed)
+        return True
+    if path.exists():
+        path.unlink()
+    return False
+
+
+def write_compressed_variants(path, data):
+    """Write the .gz and .br variants of a file's data; returns the number written"""
+    # mtime=0 keeps the output identical between builds
+    written = int(write_if_smaller(path.with_name(path.name + '.gz'), data,
+                                   gzip.compress(data, compresslevel=9, mtime=0)))
+    if brotli is not None:
+        written += write_if_smaller(path.with_name(path.name + '.br'), data,
+                                    brotli.compress(data, quality=11))
+    return written
+
+
+def main():
+    if brotli is None:
+        print("brotli not installed, writing gzip variants only")
+
+    written = 0
+    for path in sorted(STATIC_DIR.rglob('*')):
+        if not path.is_file() or path.suffix.lower() not in COMPRESSIBLE_SUFFIXES:
+            continue
+        written += write_compressed_variants(path, path.read_bytes())
+    print(f"Wrote {written} precompressed file(s) in {STATIC_DIR}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""Pre-render every read-only page and API response of app.py to static files.
+
+Usage: DATABASE_PATH=./data/pals.db python utils/export_static.py OUTPUT_DIR [--no-static]
+
+Renders /, /breeder, /pal/<id>, /api/pals and /api/pal/<id> for every pal
+through the app itself, so the output matches what Flask would serve. Pages
+are written as <path>/index.html and API responses as <path>.json, each with
+a .gz (and .br, if the brotli package is installed) variant. static/ is
+copied alongside unless --no-static is given. Serve the tree with any static
+file server, e.g. nginx with `gzip_static on` and
+`try_files $uri $uri/index.html $uri.json @app`, proxying the remaining
+routes to the app. Rerun after init_db.py rebuilds the database; pal
+pages that no longer exist are removed.
+"""
+import argparse
+import os
+import shutil
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from compress_static import brotli, write_compressed_variants  # noqa: E402
+
+# Directories holding one exported file per pal, pruned of pals that are gone
+PER_PAL_DIRS = ('pal', 'api/pal')
+
+
+def output_path(output_dir, url_path, mimetype):
+    """Map a URL path to its file: pages get a directory index, JSON a .json suffix"""
+    relative = url_path.strip('/')
+    if mimetype == 'application/json':
+        return output_dir / f"{relative}.json"
+    return output_dir / relative / 'index.html'
+
+
+def write_variants(path, data):
+    """Write a file and its precompressed variants; returns the number of files written"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return 1 + write_compressed_variants(path, data)
+
+
+def export(output_dir, copy_static=True):
+    """Render every exported URL into output_dir and return (pages, files written)"""
+    import app as app_module
+
+    output_dir = Path(output_dir)
+    graph = app_module.get_breeding_graph()
+    url_paths = ['/', '/breeder', '/api/pals']
+    for pal_id in sorted(graph.pals):
+        url_paths.append(f'/pal/{pal_id}')
+        url_paths.append(f'/api/pal/{pal_id}')
+
+    client = app_module.app.test_client()
+    exported = set()
+    written = 0
+    for url_path in url_paths:
+        response = client.get(url_path)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url_path} returned {response.status_code}")
+        path = output_path(output_dir, url_path, response.mimetype)
+        written += write_variants(path, response.get_data())
+        exported.add(path)
+
+    # Drop pages of pals removed since the last export
+    for directory in PER_PAL_DIRS:
+        for path in sorted((output_dir / directory).rglob('*'), reverse=True):
+            if path.is_file():
+                source = path.with_name(path.name.removesuffix('.gz').removesuffix('.br'))
+                if source not in exported:
+                    path.unlink()
+            elif path.is_dir() and not any(path.iterdir()):
+                path.rmdir()
+
+    if copy_static:
+        shutil.copytree(app_module.app.static_folder, output_dir / 'static', dirs_exist_ok=True)
+    return len(url_paths), written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output_dir', type=Path)
+    parser.add_argument('--no-static', action='store_true', help='do not copy static/ into the export')
+    args = parser.parse_args()
+
+    if brotli is None:
+        print("brotli not installed, writing gzip variants only")
+    # The default DATABASE_PATH is relative to the repo root
+    output_dir = args.output_dir.resolve()
+    os.chdir(ROOT_DIR)
+    pages, written = export(output_dir, copy_static=not args.no_static)
+    print(f"Exported {pages} pages ({written} files) to {output_dir}")
+
+
+if __name__ == '__main__':
+    main()
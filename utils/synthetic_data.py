@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Generate a scaled-up synthetic copy of the data/ JSON files for benchmarking.
+
+Usage: python utils/synthetic_data.py OUTPUT_DIR [--pal-scale 10] [--combination-scale 10] [--seed 0]
+
+Every pal is cloned pal-scale times ("Lamball", "Lamball 2", ...) along with
+its work suitabilities. Breeding combinations are drawn as distinct random
+parent pairs, combination-scale times as many as in data/, and each pair's
+child is the pal whose breeding rank is closest to the average of the
+parents' ranks, the way the game picks children. Output is deterministic for
+a given seed. The dense breeding matrix init_db.py writes grows with the
+square of the pal count (2 bytes per pair), about 1 GB at 100x.
+"""
+import argparse
+import json
+import random
+import shutil
+from bisect import bisect_left
+from pathlib import Path
+
+DATA_DIR = Path(__file__).resolve().parent.parent / 'data'
+
+
+def load(data_dir, name):
+    path = data_dir / name
+    if not path.exists():
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def clone_name(name, copy):
+    return name if copy == 1 else f"{name} {copy}"
+
+
+def generate(output_dir, pal_scale=10, combination_scale=10, seed=0, data_dir=DATA_DIR):
+    """Write scaled JSON files to output_dir and return (pal count, combination count)"""
+    rng = random.Random(seed)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # Lookup tables are copied unchanged
+    for name in ('elements.json', 'suitabilities.json'):
+        if (data_dir / name).exists():
+            shutil.copyfile(data_dir / name, output_dir / name)
+
+    pals = []
+    for copy in range(1, pal_scale + 1):
+        for pal in load(data_dir, 'pals.json'):
+            pals.append(dict(pal, name=clone_name(pal['name'], copy)))
+
+    work_suitabilities = []
+    for copy in range(1, pal_scale + 1):
+        for ws in load(data_dir, 'work_suitabilities.json'):
+            work_suitabilities.append(dict(ws, pal_name=clone_name(ws['pal_name'], copy)))
+
+    pal_elements = []
+    for copy in range(1, pal_scale + 1):
+        for pe in load(data_dir, 'pal_elements.json'):
+            pal_elements.append(dict(pe, pal_name=clone_name(pe['pal_name'], copy)))
+
+    # Breeding ranks: a random permutation, so every rank maps to one pal
+    names = [pal['name'] for pal in pals]
+    ranks = list(range(len(names)))
+    rng.shuffle(ranks)
+    by_rank = sorted(zip(ranks, names))
+    rank_values = [rank for rank, _ in by_rank]
+    rank_of = dict(zip(names, ranks))
+
+    def child_of(parent1, parent2):
+        average = (rank_of[parent1] + rank_of[parent2]) / 2
+        index = min(bisect_left(rank_values, average), len(by_rank) - 1)
+        if index > 0 and average - rank_values[index - 1] <= rank_values[index] - average:
+            index -= 1
+        return by_rank[index][1]
+
+    pair_count = len(names) * (len(names) + 1) // 2
+    target = min(len(load(data_dir, 'breeding_combinations.json')) * combination_scale, pair_count)
+    pairs = set()
+    while len(pairs) < target:
+        first, second = rng.randrange(len(names)), rng.randrange(len(names))
+        pairs.add((min(first, second), max(first, second)))
+    combinations = [
+        {'parent1_name': names[first], 'parent2_name': names[second],
+         'child_name': child_of(names[first], names[second])}
+        for first, second in sorted(pairs)
+    ]
+
+    outputs = {
+        'pals.json': pals,
+        'work_suitabilities.json': work_suitabilities,
+        'breeding_combinations.json': combinations,
+    }
+    if pal_elements:
+        outputs['pal_elements.json'] = pal_elements
+    for name, records in outputs.items():
+        with open(output_dir / name, 'w', encoding='utf-8') as f:
+            json.dump(records, f)
+    return len(pals), len(combinations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output_dir', type=Path)
+    parser.add_argument('--pal-scale', type=int, default=10, help='copies of each pal')
+    parser.add_argument('--combination-scale', type=int, default=10,
+                        help='multiple of the breeding combination count in data/')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    pal_count, combination_count = generate(args.output_dir, args.pal_scale, args.combination_scale, args.seed)
+    print(f"Wrote {pal_count} pals and {combination_count} breeding combinations to {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
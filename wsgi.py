@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+"""Production WSGI entry point.
+
+Usage: gunicorn --config gunicorn.conf.py wsgi:app
+
+gunicorn.conf.py sets preload_app, so this module is imported once in the
+master process and the in-memory tables loaded here are shared copy-on-write
+by every forked worker.
+"""
+import gc
+import os
+import sys
+
+from app import app, preload, start_job_server
+
+db_path = os.getenv('DATABASE_PATH', 'data/pals.db')
+if not os.path.exists(db_path):
+    sys.exit(f"Error: Database not found at {db_path}")
+
+preload()
+# Fork the background job server now, so every worker submits jobs to the same one
+start_job_server()
+# Keep the preloaded objects out of garbage collection passes in the workers,
+# which would otherwise touch (and so copy) every page they live on
+gc.freeze()
+
+application = app